@@ -0,0 +1,148 @@
+"""
+Verifica a divisão dos feeds entre workers com leases, sem acessar a internet.
+
+Simula vários workers em rodadas de `claim` e confere, a cada rodada, que nenhum
+feed tem dois donos, que todos os feeds têm dono e que ninguém passa da parte
+justa. Cobre a entrada de novos workers, a saída limpa (close), a morte de um
+worker (leases vencidos) e a remoção de feeds da configuração. Confere também que
+só são informados como assumidos os feeds que tinham outro worker como último dono,
+inclusive quando o worker reinicia com o mesmo identificador.
+
+Por padrão usa o backend SQLite em um diretório temporário. Com `--backend supabase`
+roda contra o banco configurado em SUPABASE_URL/SUPABASE_KEY (depois de aplicar
+sql/feed_leases.sql), com feeds e workers fictícios cujos leases são liberados no final.
+
+Uso:
+    python -m benchmarks.check_leases
+    python -m benchmarks.check_leases --backend supabase
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from utils.coordination.leases import FeedLeases, plan_claim
+
+TTL = 2.0
+
+
+def check_plan_claim():
+    feeds = [f"feed-{i}" for i in range(10)]
+    # Worker sozinho fica com todos os feeds livres
+    owned, released = plan_claim(feeds, {}, "a", 1)
+    assert owned == feeds and released == []
+    # Com um segundo worker, quem tem todos libera o excedente
+    owned, released = plan_claim(feeds, {feed: "a" for feed in feeds}, "a", 2)
+    assert owned == feeds[:5] and released == feeds[5:]
+    # Feed removido da configuração é liberado
+    owned, released = plan_claim(feeds[:9], {feed: "a" for feed in feeds[:5]}, "a", 2)
+    assert owned == feeds[:5] and released == []
+    owned, released = plan_claim(feeds[1:], {feeds[0]: "a"}, "a", 1)
+    assert released == [feeds[0]] and owned == feeds[1:]
+    # Nunca assume feed com lease de outro worker
+    owned, _ = plan_claim(feeds, {feed: "b" for feed in feeds}, "a", 2)
+    assert owned == []
+    print("plan_claim: ok")
+
+
+def rounds(workers: Dict[str, FeedLeases], feeds: List[str], count: int = 3) -> Dict[str, List[str]]:
+    owned = {}
+    for _ in range(count):
+        for worker_id, leases in workers.items():
+            owned[worker_id], _ = leases.claim(feeds)
+    return owned
+
+
+def assert_balanced(owned: Dict[str, List[str]], feeds: List[str], step: str):
+    assigned = [feed for worker_feeds in owned.values() for feed in worker_feeds]
+    assert len(assigned) == len(set(assigned)), f"{step}: feed com mais de um dono"
+    assert set(assigned) == set(feeds), f"{step}: feeds sem dono {set(feeds) - set(assigned)}"
+    share = math.ceil(len(feeds) / len(owned))
+    assert all(len(worker_feeds) <= share for worker_feeds in owned.values()), f"{step}: acima da parte justa"
+    print(f"{step}: ok ({', '.join(f'{worker}={len(worker_feeds)}' for worker, worker_feeds in owned.items())})")
+
+
+def check_rebalance(create):
+    feeds = [f"https://check.invalid/feed-{i}" for i in range(10)]
+    workers = {"check-a": create("check-a")}
+    try:
+        assert_balanced(rounds(workers, feeds), feeds, "1 worker")
+
+        workers["check-b"] = create("check-b")
+        workers["check-c"] = create("check-c")
+        assert_balanced(rounds(workers, feeds), feeds, "3 workers")
+
+        # Saída limpa: os leases são liberados na hora
+        workers.pop("check-c").close()
+        assert_balanced(rounds(workers, feeds), feeds, "saída de um worker")
+
+        # Morte: o worker para de renovar e os leases vencem após o TTL
+        dead = workers.pop("check-b")
+        time.sleep(TTL + 0.5)
+        assert_balanced(rounds(workers, feeds), feeds, "leases vencidos")
+        dead.close()
+
+        # Feeds removidos da configuração são liberados
+        assert_balanced(rounds(workers, feeds[:6]), feeds[:6], "feeds removidos")
+    finally:
+        for leases in workers.values():
+            leases.close()
+
+
+def check_last_owner(create):
+    feeds = [f"https://check.invalid/owner-{i}" for i in range(4)]
+    first = create("owner-a")
+    second = None
+    try:
+        owned, acquired = first.claim(feeds)
+        assert owned == feeds and acquired == [], "feeds novos não foram assumidos de ninguém"
+
+        # Reiniciar com o mesmo identificador não conta como assumir os feeds
+        first.close()
+        first = create("owner-a")
+        owned, acquired = first.claim(feeds)
+        assert owned == feeds and acquired == [], "worker reiniciado assumiu os próprios feeds"
+
+        # O segundo worker assume a metade liberada pelo primeiro
+        second = create("owner-b")
+        second.claim(feeds)
+        first.claim(feeds)
+        owned, acquired = second.claim(feeds)
+        assert owned == feeds[2:] and acquired == owned, f"assumidos: {acquired}"
+        owned, acquired = second.claim(feeds)
+        assert acquired == [], "feeds continuaram assumidos na renovação"
+        print("último dono: ok")
+    finally:
+        first.close()
+        if second is not None:
+            second.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Verifica a divisão dos feeds entre workers com leases")
+    parser.add_argument("--backend", choices=("sqlite", "supabase"), default="sqlite")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    check_plan_claim()
+    if args.backend == "supabase":
+        from utils.coordination.supabase_leases import SupabaseFeedLeases
+        create = lambda worker_id: SupabaseFeedLeases(worker_id=worker_id, ttl=TTL)
+        check_rebalance(create)
+        check_last_owner(create)
+        return
+
+    from utils.coordination.sqlite_leases import SQLiteFeedLeases
+    with tempfile.TemporaryDirectory(prefix="crypto-news-leases-") as workdir:
+        path = os.path.join(workdir, "leases.sqlite3")
+        create = lambda worker_id: SQLiteFeedLeases(path, worker_id=worker_id, ttl=TTL)
+        check_rebalance(create)
+        check_last_owner(create)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Verifica a detecção de notícias quase duplicadas com pares de títulos reais, sem
+acessar a internet. Cada caso diz se a segunda notícia deve ser descartada como
+duplicata da primeira.
+
+Uso:
+    python -m benchmarks.check_near_duplicates
+"""
+from utils.dedupe.near_duplicate import NearDuplicateDetector
+from utils.rss.feed_parser import News
+
+# (fonte, título) da primeira notícia, (fonte, título) da segunda, é duplicata?
+CASES = [
+    # A mesma notícia em fontes diferentes
+    (("Cointelegraph", "Trump anuncia reserva estratégica de Bitcoin nos Estados Unidos"),
+     ("CryptoNews.com", "Trump anuncia reserva estratégica de Bitcoin dos Estados Unidos"), True),
+    (("Investing.com", "SEC aprova ETF de Ethereum à vista da BlackRock"),
+     ("Cointelegraph", "SEC aprova ETF à vista de Ethereum da BlackRock"), True),
+    (("Cointelegraph", "Bitcoin Hits $100,000 For The First Time"),
+     ("CryptoNews.com", "Bitcoin Hits $100,000 for the First Time Ever"), True),
+    # Notícias diferentes da mesma fonte
+    (("Cointelegraph", "Bitcoin sobe após Trump anunciar reserva estratégica"),
+     ("Cointelegraph", "Bitcoin cai após Trump anunciar reserva estratégica"), False),
+    (("CryptoNews.com", "Binance lista novo token de inteligência artificial"),
+     ("CryptoNews.com", "Binance remove novo token de inteligência artificial"), False),
+    # Notícias diferentes em fontes diferentes
+    (("Cointelegraph", "Bitcoin sobe após Trump anunciar reserva estratégica"),
+     ("CryptoNews.com", "Bitcoin cai após Trump anunciar reserva estratégica"), False),
+    (("Investing.com", "SEC aprova ETF de Solana da Grayscale"),
+     ("Cointelegraph", "SEC adia decisão sobre ETF de Solana da Grayscale"), False),
+    (("CryptoNews.com", "Binance lista novo token de inteligência artificial"),
+     ("Cointelegraph", "Binance remove novo token de inteligência artificial"), False),
+    (("Cointelegraph", "Bitcoin cai 5% após dados de inflação nos EUA"),
+     ("Investing.com", "Ethereum cai 5% após dados de inflação nos EUA"), False),
+    (("Cointelegraph", "Bitcoin cai 5% após dados de inflação nos EUA"),
+     ("Investing.com", "Bitcoin cai 8% após dados de inflação nos EUA"), False),
+    (("Cointelegraph", "Bitcoin Rises After Fed Holds Rates Steady"),
+     ("CryptoNews.com", "Bitcoin Falls After Fed Holds Rates Steady"), False),
+    (("Cointelegraph", "Bitcoin Rises After Fed Holds Rates"),
+     ("CryptoNews.com", "Solana Rises After Fed Holds Rates"), False),
+    # Títulos curtos demais
+    (("Cointelegraph", "Bitcoin hoje"), ("CryptoNews.com", "Bitcoin hoje"), False),
+]
+
+
+def news(index: int, source: str, title: str) -> News:
+    return News(title=title, url=f"https://check.invalid/{index}", source=source,
+                published_time="2025-01-01 00:00:00")
+
+
+def main():
+    failures = 0
+    for index, (first, second, expected) in enumerate(CASES):
+        detector = NearDuplicateDetector()
+        detector.check_and_add(news(2 * index, *first))
+        is_duplicate = detector.check_and_add(news(2 * index + 1, *second)) is not None
+        status = "ok" if is_duplicate == expected else "FALHOU"
+        failures += is_duplicate != expected
+        print(f"{status}: {first[1]!r} / {second[1]!r} -> {'duplicata' if is_duplicate else 'distintas'}")
+    if failures:
+        raise SystemExit(f"{failures} casos falharam")
+    print(f"{len(CASES)} casos ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Servidores locais que substituem os serviços externos nos benchmarks:
+feeds RSS + imagens, API REST do Supabase e gateway do WhatsApp.
+"""
+import io
+import json
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+
+class FakeServer:
+    """Servidor HTTP em thread própria, escutando em uma porta livre do localhost."""
+
+    handler_class = _QuietHandler
+
+    def __init__(self, port: int = 0):
+        handler = type(f"{type(self).__name__}Handler", (self.handler_class,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    """Gera um JPEG com ruído para ter um tamanho parecido com o de fotos reais."""
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+class _FeedHandler(_QuietHandler):
+    def do_GET(self):
+        state: "FakeFeedServer" = self.server_state
+        if self.path.startswith("/feed/"):
+            name = self.path[len("/feed/"):].split(".")[0]
+            with state.lock:
+                body, etag = state.feeds.get(name), state.etags.get(name)
+            if body is None:
+                return self._send(404, b"", "text/plain")
+            if state.support_etag and self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", "application/rss+xml")
+            return self._send(200, body, "application/rss+xml; charset=utf-8", {"ETag": etag})
+        if self.path.startswith("/images/"):
+            index = int(self.path[len("/images/"):].split(".")[0])
+            return self._send(200, state.images[index % len(state.images)], "image/jpeg")
+        self._send(404, b"", "text/plain")
+
+
+class FakeFeedServer(FakeServer):
+    """
+    Serve `feed_count` feeds RSS com `items_per_feed` itens cada, em /feed/<n>.xml,
+    e as imagens dos itens em /images/<i>.jpg. `publish` acrescenta itens novos no
+    topo de cada feed, como um feed real entre dois ciclos.
+    """
+
+    handler_class = _FeedHandler
+
+    def __init__(self, feed_count: int = 3, items_per_feed: int = 30, summary_size: int = 2000,
+                 image_width: int = 1600, image_height: int = 900, distinct_images: int = 8,
+                 support_etag: bool = True):
+        super().__init__()
+        self.support_etag = support_etag
+        self.images = [make_jpeg(image_width, image_height, seed) for seed in range(distinct_images)]
+        self.lock = threading.Lock()
+        self.feeds: Dict[str, bytes] = {}
+        self.etags: Dict[str, str] = {}
+        self._feed_count = feed_count
+        self._items_per_feed = items_per_feed
+        self._summary_size = summary_size
+        # XML dos itens de cada feed, do mais novo para o mais antigo
+        self._items: Dict[int, List[str]] = {}
+        self._rngs: Dict[int, random.Random] = {}
+        self._published: Dict[int, int] = {}
+        self._revision = 0
+
+    def __enter__(self):
+        super().__enter__()
+        # O XML depende da porta, que só existe depois de criar o servidor
+        now = time.time()
+        for feed in range(self._feed_count):
+            self._rngs[feed] = random.Random(feed)
+            self._published[feed] = 0
+            # Do mais antigo para o mais novo, como se tivessem sido publicados a cada 10 minutos
+            items = [self._build_item(feed, now - age * 600) for age in reversed(range(self._items_per_feed))]
+            self._items[feed] = items[::-1]
+            self._render(feed)
+        return self
+
+    def publish(self, count: int):
+        """Publica `count` itens novos em cada feed, descartando os mais antigos."""
+        now = time.time()
+        with self.lock:
+            for feed in range(self._feed_count):
+                new_items = [self._build_item(feed, now) for _ in range(count)]
+                self._items[feed] = (new_items[::-1] + self._items[feed])[:self._items_per_feed]
+                self._render(feed)
+
+    def _random_text(self, rng: random.Random, size: int) -> str:
+        # Texto diferente para cada item, para não ser tratado como quase duplicata
+        words = []
+        length = 0
+        while length < size:
+            word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+            words.append(f"<b>{word}</b>" if rng.random() < 0.05 else word)
+            length += len(word) + 1
+        return " ".join(words)
+
+    def _build_item(self, feed: int, published: float) -> str:
+        rng = self._rngs[feed]
+        item = self._published[feed]
+        self._published[feed] += 1
+        index = feed * self._items_per_feed + item
+        title = self._random_text(rng, 60).replace("<b>", "").replace("</b>", "")
+        summary = escape(f"<p>{self._random_text(rng, self._summary_size)}</p>")
+        return f"""
+    <item>
+      <title>{title}</title>
+      <link>{self.base_url}/news/{feed}/{item}</link>
+      <pubDate>{formatdate(published)}</pubDate>
+      <description>{summary}</description>
+      <media:content url="{self.base_url}/images/{index}.jpg" medium="image"/>
+    </item>"""
+
+    def _render(self, feed: int):
+        name = str(feed)
+        self._revision += 1
+        self.feeds[name] = f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">
+  <channel>
+    <title>Feed {feed}</title>
+    <link>{self.base_url}</link>
+    <description>Feed de benchmark</description>{''.join(self._items[feed])}
+  </channel>
+</rss>""".encode("utf-8")
+        self.etags[name] = f'"{feed}-{self._revision}"'
+
+    @property
+    def rss_feeds(self) -> List[Dict[str, str]]:
+        return [{f"Fonte {name}": f"{self.base_url}/feed/{name}.xml"} for name in self.feeds]
+
+
+class _SupabaseHandler(_QuietHandler):
+    def do_POST(self):
+        state: "FakeSupabaseServer" = self.server_state
+        time.sleep(state.latency)
+        body = self._read_body()
+        if self.path.startswith("/rest/v1/rpc/get_latest_news_per_source"):
+            return self._send(200, json.dumps(state.latest_by_source()).encode(), "application/json")
+        if self.path.startswith("/rest/v1/"):
+            rows = json.loads(body or b"[]")
+            rows = rows if isinstance(rows, list) else [rows]
+            with state.lock:
+                state.rows.extend(rows)
+            return self._send(201, json.dumps(rows).encode(), "application/json")
+        self._send(404, b"{}", "application/json")
+
+
+class FakeSupabaseServer(FakeServer):
+    """Imita os endpoints do PostgREST usados pelo Database (insert e RPC)."""
+
+    handler_class = _SupabaseHandler
+    # O cliente do Supabase exige uma chave com formato de JWT
+    api_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYmVuY2gifQ.YmVuY2g"
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.rows: List[Dict] = []
+        self.lock = threading.Lock()
+
+    def latest_by_source(self) -> List[Dict]:
+        latest: Dict[str, str] = {}
+        with self.lock:
+            for row in self.rows:
+                if row["published_time"] > latest.get(row["source"], ""):
+                    latest[row["source"]] = row["published_time"]
+        return [{"source": source, "published_time": value} for source, value in latest.items()]
+
+
+class _GatewayHandler(_QuietHandler):
+    def do_POST(self):
+        state: "FakeWhatsAppGateway" = self.server_state
+        self._read_body()
+        time.sleep(state.latency)
+        if self.path != "/send/image":
+            return self._send(404, b"{}", "application/json")
+        with state.lock:
+            fail = state.random.random() < state.error_rate
+            if fail:
+                state.errors += 1
+            else:
+                state.sent += 1
+        if fail:
+            return self._send(503, b'{"message": "erro simulado"}', "application/json", {"Retry-After": "0"})
+        self._send(200, b'{"code": "SUCCESS"}', "application/json")
+
+
+class FakeWhatsAppGateway(FakeServer):
+    """Imita o endpoint /send/image do gateway com latência e taxa de erro configuráveis."""
+
+    handler_class = _GatewayHandler
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, seed: int = 0):
+        super().__init__()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.errors = 0
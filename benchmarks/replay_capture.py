@@ -0,0 +1,83 @@
+"""
+Reexecuta offline um ciclo gravado com `python main.py --record captura.zip`.
+
+Os feeds e as imagens vêm do arquivo de captura e passam pelos mesmos caminhos
+do FeedParser e do ImageScraper; o Supabase e o gateway do WhatsApp são
+substituídos pelos servidores locais do benchmark, então nada é publicado. O
+índice de deduplicação e o Outbox começam no estado do ciclo gravado, então o
+replay encontra e envia as mesmas notícias.
+
+Uso:
+    python -m benchmarks.replay_capture captura.zip --profile perfis/
+"""
+import argparse
+import tempfile
+import time
+from contextlib import ExitStack
+
+from benchmarks.fake_servers import FakeSupabaseServer, FakeWhatsAppGateway
+from benchmarks.run_benchmark import configure_environment
+
+
+def seed_state(services, archive):
+    """
+    Reproduz o estado local do início do ciclo gravado: marca como vistas as
+    entradas dos feeds que não eram novas e recoloca no Outbox as notícias que
+    já estavam pendentes.
+    """
+    from main import feeds_with_news
+    from utils.rss.feed_parser import FeedParser, News
+
+    if archive.new_urls is None:
+        print("Captura sem o estado do ciclo: todas as entradas dos feeds serão tratadas como novas")
+        return
+    new_urls = set(archive.new_urls)
+    feed = FeedParser(archive.rss_feeds, archive=archive)
+    services.dedupe.add_many(news.url for news in feed.news if news.url not in new_urls)
+    services.dedupe.add_feeds(feeds_with_news(archive.rss_feeds, feed.news))
+    services.outbox.enqueue_many([News(**item) for item in archive.pending_news])
+    print(f"Estado do ciclo gravado: {len(new_urls)} notícias novas, "
+          f"{len(archive.pending_news)} pendentes no Outbox")
+
+
+def replay(args):
+    with ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="crypto-news-replay-"))
+        supabase = stack.enter_context(FakeSupabaseServer(latency=args.db_latency))
+        gateway = stack.enter_context(FakeWhatsAppGateway(latency=args.gateway_latency))
+        configure_environment(workdir, supabase, gateway)
+
+        # Importa só depois de configurar o ambiente, pois os módulos leem as variáveis no import
+        import main
+        from utils.capture.archive import CaptureArchive, REPLAY
+        from utils.metrics.profiling import profiler
+
+        archive = CaptureArchive(args.capture, REPLAY)
+        main.rss_feeds[:] = archive.rss_feeds
+        print(f"Captura com {len(main.rss_feeds)} feeds")
+        if args.profile:
+            profiler.enable(args.profile)
+
+        services = main.Services(archive)
+        try:
+            seed_state(services, archive)
+            started_at = time.perf_counter()
+            main.run_cycle(services)
+            elapsed = time.perf_counter() - started_at
+        finally:
+            services.close()
+        print(f"\nCiclo reexecutado em {elapsed:.2f}s, {gateway.sent} mensagens enviadas ao gateway falso")
+        profiler.dump()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reexecuta offline um ciclo gravado com --record")
+    parser.add_argument("capture", help="Arquivo zip gravado com main.py --record")
+    parser.add_argument("--profile", metavar="DIRETORIO", help="Grava um perfil do cProfile por etapa")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Latência do Supabase falso (s)")
+    parser.add_argument("--gateway-latency", type=float, default=0.0, help="Latência do gateway falso (s)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    replay(parse_args())
@@ -0,0 +1,212 @@
+"""
+Benchmark offline do pipeline completo (feeds -> banco -> imagens -> WhatsApp).
+
+Sobe servidores locais no lugar dos feeds, do Supabase e do gateway do WhatsApp,
+executa ciclos do main.run_cycle e mede a vazão (itens/s) e as latências p50/p95
+de cada etapa. O primeiro ciclo é a frio; antes de cada ciclo seguinte, cada feed
+publica `--new-items` itens novos, que é o caso comum em produção.
+
+Uso:
+    python -m benchmarks.run_benchmark --feeds 3 --items 30 --new-items 5 --gateway-latency 0.05
+"""
+import argparse
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from typing import Dict, List
+
+from benchmarks.fake_servers import FakeFeedServer, FakeSupabaseServer, FakeWhatsAppGateway
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil pelo método nearest-rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class StageRecorder:
+    """
+    Substitui métodos das classes do pipeline por versões que medem o tempo de
+    cada chamada (para corrotinas, o tempo até a conclusão).
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._patched = []
+
+    def patch(self, cls, name: str, stage: str):
+        original = getattr(cls, name)
+        recorder = self
+
+        def record(started_at: float):
+            elapsed = time.perf_counter() - started_at
+            with recorder._lock:
+                recorder.samples.setdefault(stage, []).append(elapsed)
+
+        if inspect.iscoroutinefunction(original):
+            async def timed(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    record(started_at)
+        else:
+            def timed(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    record(started_at)
+
+        setattr(cls, name, timed)
+        self._patched.append((cls, name, original))
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+
+    def restore(self):
+        for cls, name, original in reversed(self._patched):
+            setattr(cls, name, original)
+        self._patched = []
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "total_s": sum(values),
+            }
+            for stage, values in sorted(self.samples.items())
+        }
+
+
+def configure_environment(workdir: str, supabase: FakeSupabaseServer, gateway: FakeWhatsAppGateway):
+    """Aponta a aplicação para os servidores falsos e isola os arquivos locais em `workdir`."""
+    os.environ.update({
+        "SUPABASE_URL": supabase.base_url,
+        "SUPABASE_KEY": supabase.api_key,
+        "WHATSAPP_HOST": "127.0.0.1",
+        "WHATSAPP_PORT": str(gateway.port),
+        "STATE_DIR": workdir,
+        "NEWSLETTER_ID": "benchmark",
+        "WHATSAPP_RATE": "100000",
+        "WHATSAPP_BURST": "100000",
+        "FEED_CACHE_PATH": os.path.join(workdir, "feeds.json"),
+        "FEED_HEALTH_PATH": os.path.join(workdir, "feed_health.json"),
+        "FEED_SCHEDULE_PATH": os.path.join(workdir, "feed_schedule.json"),
+        "BLOCKED_DOMAINS_PATH": os.path.join(workdir, "blocked_domains.json"),
+        "IMAGE_CACHE_DIR": os.path.join(workdir, "images"),
+        "DEDUPE_INDEX_PATH": os.path.join(workdir, "dedupe.sqlite3"),
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite3"),
+        "STORAGE_SQLITE_PATH": os.path.join(workdir, "news.sqlite3"),
+    })
+    # O ciclo a quente precisa consultar todos os feeds (requisições condicionais); com o
+    # agendador adaptativo nenhum feed estaria no horário. Defina FEED_ADAPTIVE_POLLING=1 para medi-lo
+    os.environ.setdefault("FEED_ADAPTIVE_POLLING", "0")
+
+
+def run_benchmark(args) -> Dict:
+    with ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="crypto-news-bench-"))
+        feeds = stack.enter_context(FakeFeedServer(
+            feed_count=args.feeds, items_per_feed=args.items, summary_size=args.summary_size,
+            image_width=args.image_width, image_height=args.image_height
+        ))
+        supabase = stack.enter_context(FakeSupabaseServer(latency=args.db_latency))
+        gateway = stack.enter_context(FakeWhatsAppGateway(
+            latency=args.gateway_latency, error_rate=args.gateway_error_rate
+        ))
+        configure_environment(workdir, supabase, gateway)
+        # Mede o envio item a item; defina DIGEST_THRESHOLD para medir o modo de resumos
+        os.environ.setdefault("DIGEST_THRESHOLD", "0")
+
+        # Importa só depois de configurar o ambiente, pois os módulos leem as variáveis no import
+        import main
+        from utils.rss.feed_parser import FeedParser
+        from utils.scraper.scraper import ImageScraper
+        from utils.database.storage import NewsStorage
+        from utils.wpp.gateway_client import AsyncGatewayClient
+
+        main.rss_feeds[:] = feeds.rss_feeds
+
+        recorder = StageRecorder()
+        stack.callback(recorder.restore)
+        # Toda a busca de notícias do ciclo, inclusive o consumo de iter_new_news
+        recorder.patch(main, "collect_news", "Feeds (total)")
+        recorder.patch(FeedParser, "_download_feed", "FeedParser.download")
+        recorder.patch(FeedParser, "_parse_content", "FeedParser.parse")
+        recorder.patch(FeedParser, "_create_news_from_entry", "FeedParser.entry")
+        recorder.patch(ImageScraper, "get_image_bytes", "ImageScraper")
+        recorder.patch(NewsStorage, "get_latest_news_per_source", "Database.rpc")
+        recorder.patch(NewsStorage, "insert_many_news", "Database.insert")
+        recorder.patch(AsyncGatewayClient, "_send_with_retries", "WhatsAppSender")
+
+        services = main.Services()
+        stack.callback(services.close)
+
+        results = {"config": vars(args), "cycles": []}
+        for cycle in range(args.cycles):
+            if cycle > 0 and args.new_items:
+                feeds.publish(args.new_items)
+            recorder.reset()
+            sent_before = gateway.sent
+            started_at = time.perf_counter()
+            main.run_cycle(services)
+            elapsed = time.perf_counter() - started_at
+            sent = gateway.sent - sent_before
+            results["cycles"].append({
+                "cycle": cycle + 1,
+                "elapsed_s": elapsed,
+                "sent": sent,
+                "items_per_s": sent / elapsed if elapsed else 0.0,
+                "stages": recorder.summary(),
+            })
+        results["gateway_errors"] = gateway.errors
+        return results
+
+
+def print_report(results: Dict):
+    for cycle in results["cycles"]:
+        print(f"\nCiclo {cycle['cycle']}: {cycle['sent']} enviadas em {cycle['elapsed_s']:.2f}s "
+              f"({cycle['items_per_s']:.1f} itens/s)")
+        print(f"{'Etapa':<20}{'chamadas':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'total (s)':>12}")
+        for stage, stats in cycle["stages"].items():
+            print(f"{stage:<20}{stats['count']:>10}{stats['p50_ms']:>12.1f}"
+                  f"{stats['p95_ms']:>12.1f}{stats['total_s']:>12.2f}")
+    print(f"\nErros simulados no gateway: {results['gateway_errors']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de notícias")
+    parser.add_argument("--feeds", type=int, default=3, help="Número de feeds RSS falsos")
+    parser.add_argument("--items", type=int, default=30, help="Itens por feed")
+    parser.add_argument("--new-items", type=int, default=5,
+                        help="Itens novos publicados em cada feed antes de cada ciclo a quente")
+    parser.add_argument("--summary-size", type=int, default=2000, help="Tamanho do resumo HTML de cada item")
+    parser.add_argument("--image-width", type=int, default=1600)
+    parser.add_argument("--image-height", type=int, default=900)
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Latência do Supabase falso (s)")
+    parser.add_argument("--gateway-latency", type=float, default=0.05, help="Latência do gateway falso (s)")
+    parser.add_argument("--gateway-error-rate", type=float, default=0.0, help="Fração de envios com erro 503")
+    parser.add_argument("--cycles", type=int, default=2, help="Ciclos executados (o primeiro é a frio)")
+    parser.add_argument("--json", help="Grava o resultado completo neste arquivo JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_benchmark(args)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -1,46 +1,329 @@
+from dotenv import load_dotenv
+
+# Carrega o .env antes dos demais imports, que leem configurações opcionais do ambiente
+load_dotenv()
+
+import argparse
+import os
+import signal
+import threading
 import time
-from utils.rss.feed_parser import FeedParser, rss_feeds
+import requests
+from typing import Dict, List, Optional, Tuple
+from utils.rss.feed_parser import FeedParser, News, rss_feeds, DEFAULT_IMAGES
+from utils.rss.feed_cache import FeedCache
+from utils.rss.feed_health import FeedHealth
+from utils.rss.feed_scheduler import FeedScheduler, FEED_ADAPTIVE_POLLING
 from utils.scraper.scraper import ImageScraper
+from utils.scraper.image_cache import ImageCache
+from utils.scraper.image_normalizer import ImageNormalizer
 from utils.wpp.wpp import WhatsAppSender
-from utils.database.database import Database
+from utils.database.storage import NewsStorage, create_storage
+from utils.pipeline.pipeline import deliver_news, deliver_digest, DIGEST_THRESHOLD
+from utils.dedupe.dedupe_index import DedupeIndex
+from utils.dedupe.near_duplicate import NearDuplicateDetector
+from utils.outbox.outbox import Outbox
+from utils.coordination.leases import FeedLeases, create_leases
+from utils.metrics.metrics import start_metrics_server, METRICS_PORT
+from utils.metrics.profiling import profiler, profile_stage
+from utils.capture.archive import CaptureArchive, RECORD
+
+# Intervalo (em segundos) entre os ciclos no modo daemon
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "300"))
 
-def main():
-    feed = FeedParser(rss_feeds)
-    db = Database()
-    latest_news_times_by_source = db.get_latest_news_per_source()    
-    unpublished_news = feed.get_unpublished_news(latest_news_times_by_source)
+
+class Services:
+    """
+    Recursos compartilhados entre os ciclos: cliente do banco, sessão HTTP dos
+    feeds, caches, sender do WhatsApp e pool de navegadores.
+    Cada recurso é criado na primeira vez que é usado e reaproveitado depois.
     
-    if not unpublished_news:
+    Com um CaptureArchive, os feeds e imagens são gravados no arquivo (ou lidos
+    dele, no modo replay).
+    """
+
+    def __init__(self, archive: Optional[CaptureArchive] = None):
+        self.archive = archive
+        self.feed_session = requests.Session()
+        self.feed_cache = FeedCache()
+        self.feed_health = FeedHealth()
+        # Sem agendamento adaptativo, todos os feeds são consultados em todo ciclo
+        self.scheduler: Optional[FeedScheduler] = (
+            FeedScheduler(default_interval=POLL_INTERVAL) if FEED_ADAPTIVE_POLLING else None
+        )
+        self.dedupe = DedupeIndex()
+        self.near_duplicates = NearDuplicateDetector()
+        self.outbox = Outbox()
+        # Com LEASE_BACKEND, os feeds são divididos entre os workers que usam o mesmo banco
+        self.leases: Optional[FeedLeases] = create_leases()
+        self._db: Optional[NewsStorage] = None
+        self._wpp: Optional[WhatsAppSender] = None
+        self._scraper: Optional[ImageScraper] = None
+        self._normalizer: Optional[ImageNormalizer] = None
+        self._image_cache: Optional[ImageCache] = None
+
+    @property
+    def image_cache(self) -> ImageCache:
+        if self._image_cache is None:
+            self._image_cache = ImageCache(memory_urls=[image['url'] for image in DEFAULT_IMAGES.values()])
+        return self._image_cache
+
+    @property
+    def db(self) -> NewsStorage:
+        if self._db is None:
+            self._db = create_storage()
+        return self._db
+
+    @property
+    def wpp(self) -> WhatsAppSender:
+        if self._wpp is None:
+            self._wpp = WhatsAppSender()
+        return self._wpp
+
+    @property
+    def scraper(self) -> ImageScraper:
+        if self._scraper is None:
+            self._scraper = ImageScraper(cache=self.image_cache, archive=self.archive)
+        return self._scraper
+
+    @property
+    def normalizer(self) -> ImageNormalizer:
+        if self._normalizer is None:
+            self._normalizer = ImageNormalizer(cache=self.image_cache)
+        return self._normalizer
+
+    def close(self):
+        if self._scraper is not None:
+            self._scraper.close()
+        if self._normalizer is not None:
+            self._normalizer.close()
+        if self._image_cache is not None:
+            self._image_cache.save()
+        if self._wpp is not None:
+            self._wpp.close()
+        self.feed_session.close()
+        self.dedupe.close()
+        self.outbox.close()
+        if self._db is not None:
+            self._db.close()
+        if self.leases is not None:
+            self.leases.close()
+        if self.archive is not None:
+            self.archive.close()
+
+
+def feed_url(feed_dict: Dict[str, str]) -> str:
+    return next(iter(feed_dict.values()))
+
+
+def claim_feeds(services: Services) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Retorna os feeds deste worker e, entre eles, os assumidos de outro worker.
+    Sem coordenação, o worker processa todos os feeds.
+    """
+    if services.leases is None:
+        return rss_feeds, []
+    owned, acquired = services.leases.claim([feed_url(feed) for feed in rss_feeds])
+    owned, acquired = set(owned), set(acquired)
+    print(f"Worker {services.leases.worker_id}: {len(owned)} de {len(rss_feeds)} feeds")
+    return ([feed for feed in rss_feeds if feed_url(feed) in owned],
+            [feed for feed in rss_feeds if feed_url(feed) in acquired])
+
+
+def bootstrap_news(services: Services, feeds: List[Dict[str, str]]) -> List[News]:
+    """
+    Busca os feeds sem histórico no índice local: usa o horário das últimas
+    notícias no banco e marca o restante do feed como já visto.
+    """
+    feed = FeedParser(feeds, cache=services.feed_cache, session=services.feed_session,
+                      health=services.feed_health, scheduler=services.scheduler, archive=services.archive)
+    # Com vários workers, outro processo pode ter gravado notícias desses feeds
+    latest_news_times_by_source = services.db.get_latest_news_per_source(refresh=services.leases is not None)
+    unpublished_news = [news for news in feed.get_unpublished_news(latest_news_times_by_source)
+                        if news.url not in services.dedupe]
+    new_urls = {news.url for news in unpublished_news}
+    services.dedupe.add_many(news.url for news in feed.news if news.url not in new_urls)
+    # Feeds que falharam ou vieram vazios continuam sem histórico e partem do banco de novo
+    services.dedupe.add_feeds(feeds_with_news(feeds, feed.news))
+    return unpublished_news
+
+
+def feeds_with_news(feeds: List[Dict[str, str]], news_list: List[News]) -> List[str]:
+    sources = {news.source for news in news_list}
+    return [feed_url(feed) for feed in feeds if next(iter(feed)) in sources]
+
+
+def run_cycle(services: Services, stop_event: Optional[threading.Event] = None):
+    """
+    Executa um ciclo completo: feeds -> banco -> imagens -> WhatsApp.
+    Com `stop_event` acionado, o envio para antes da próxima notícia.
+    Uma falha ao buscar ou gravar as notícias (feeds, leases ou banco fora do ar)
+    não impede o envio do que já está na fila durável.
+    """
+    try:
+        with profile_stage("feeds"):
+            unpublished_news = collect_news(services)
+        if services.archive is not None and services.archive.recording:
+            # Guarda o estado local do ciclo para que o replay encontre as mesmas notícias
+            services.archive.record_cycle(unpublished_news, services.outbox.due())
+        with profile_stage("storage"):
+            store_news(services, unpublished_news)
+    except Exception as e:
+        print(f"Erro ao buscar notícias novas: {str(e)}")
+    with profile_stage("delivery"):
+        deliver_pending(services, stop_event)
+
+
+def collect_news(services: Services) -> List[News]:
+    """Busca nos feeds deste worker as notícias ainda não vistas."""
+    dedupe = services.dedupe
+    dedupe.prune()
+
+    feeds, acquired = claim_feeds(services)
+    # Um feed assumido de outro worker pode ter notícias enviadas por ele que este
+    # não viu, então o histórico local dele deixa de valer
+    dedupe.forget_feeds(feed_url(feed) for feed in acquired)
+    # Para feeds sem histórico no índice local, o ponto de partida vem do banco
+    known_feeds = dedupe.known_feeds()
+    bootstrap_feeds = [feed for feed in feeds if feed_url(feed) not in known_feeds]
+    bootstrap_urls = {feed_url(feed) for feed in bootstrap_feeds}
+    # Os demais feeds só são consultados quando o agendador diz que estão no horário
+    due_feeds = services.scheduler.due(feeds) if services.scheduler else feeds
+    streaming_feeds = [feed for feed in due_feeds if feed_url(feed) not in bootstrap_urls]
+
+    unpublished_news = bootstrap_news(services, bootstrap_feeds) if bootstrap_feeds else []
+    if streaming_feeds:
+        # Processa apenas as entradas que ainda não estão no índice
+        feed = FeedParser(streaming_feeds, cache=services.feed_cache, session=services.feed_session,
+                          health=services.feed_health, scheduler=services.scheduler,
+                          archive=services.archive, lazy=True)
+        streamed_news = list(feed.iter_new_news(seen_index=dedupe))
+        # Mantém o histórico dos feeds com notícias novas dentro da retenção do índice
+        dedupe.add_feeds(feeds_with_news(streaming_feeds, streamed_news))
+        unpublished_news.extend(streamed_news)
+    unpublished_news.sort(key=lambda x: x.published_time)
+    return unpublished_news
+
+
+def store_news(services: Services, unpublished_news: List[News]):
+    """Coloca as notícias novas na fila de envio, no índice local e no banco."""
+    if unpublished_news:
+        print(f"Encontradas {len(unpublished_news)} notícias novas")
+
+        # A mesma história publicada por várias fontes é enviada uma única vez
+        unique_news, duplicates = services.near_duplicates.filter(unpublished_news)
+        for news, original_url in duplicates:
+            print(f"Notícia duplicada ignorada: {news.url} (original: {original_url})")
+
+        # Colocar na fila durável antes de marcar como vistas, para que nada se perca
+        services.outbox.enqueue_many(unique_news)
+        services.dedupe.add_many(news.url for news in unpublished_news)
+        try:
+            services.db.insert_many_news(unpublished_news)
+            print("Notícias inseridas no banco de dados")
+        except Exception as e:
+            # O índice local já evita reenvios, então o envio segue mesmo sem o banco
+            print(f"Erro ao inserir notícias no banco: {str(e)}")
+    else:
         print("Nenhuma notícia nova encontrada")
+
+
+def deliver_pending(services: Services, stop_event: Optional[threading.Event] = None):
+    """Envia tudo que está pendente na fila durável."""
+    # Enviar tudo que está pendente na fila, incluindo sobras de execuções anteriores
+    pending_news = services.outbox.due()
+    if not pending_news:
         return
-        
-    print(f"Encontradas {len(unpublished_news)} notícias novas")
-    
-    # Inserir novas notícias no banco
-    db.insert_many_news(unpublished_news)
-    print("Notícias inseridas no banco de dados")
-    
-    # Enviar notícias para o WhatsApp
-    wpp = WhatsAppSender()
-    scraper = ImageScraper()
-    
-    for news in unpublished_news:
-        print(f"\nProcessando notícia: {news.title}")
-        # Baixar imagem
-        image_bytes, image_format = scraper.get_image_bytes(news)
-        if not image_bytes:
-            print(f"Erro ao baixar a imagem para {news.image_url}")
-            continue
-            
-        # Enviar mensagem
-        success = wpp.send_news(news, image_bytes)
-        if success:
-            print(f"Mensagem enviada com sucesso para {news.source}")
-        else:
-            print(f"Erro ao enviar noticia {news.source} link:{news.url} ")
-            
-        time.sleep(2)
+
+    print(f"{len(pending_news)} notícias pendentes de envio")
+    if DIGEST_THRESHOLD and len(pending_news) > DIGEST_THRESHOLD:
+        # Modo de recuperação: muitas notícias acumuladas são enviadas em resumos
+        print(f"Mais de {DIGEST_THRESHOLD} notícias pendentes, enviando em resumos")
+        stats = deliver_digest(pending_news, services.scraper, services.wpp,
+                               outbox=services.outbox, normalizer=services.normalizer, stop_event=stop_event)
+    else:
+        stats = deliver_news(pending_news, services.scraper, services.wpp,
+                             outbox=services.outbox, normalizer=services.normalizer, stop_event=stop_event)
+    print(f"\nEnviadas: {stats['sent']}, falhas: {stats['failed']}, sem imagem: {stats['no_image']}")
+    services.outbox.purge_sent()
+
+
+def install_stop_handler() -> threading.Event:
+    """
+    Aciona o evento retornado em SIGTERM/SIGINT. O ciclo em andamento para de
+    enviar e grava o Outbox, cabendo no prazo do `docker stop`.
+    """
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"\nSinal {signum} recebido, encerrando...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    return stop
+
+
+def run_daemon(interval: float = POLL_INTERVAL, archive: Optional[CaptureArchive] = None):
+    """
+    Executa ciclos continuamente, mantendo os recursos aquecidos entre eles.
+    Com o agendamento adaptativo, o próximo ciclo começa quando o próximo feed
+    estiver no horário, limitado a `interval`.
+    SIGTERM/SIGINT interrompem a espera, ou o envio em andamento, e encerram o serviço.
+    """
+    stop = install_stop_handler()
+    services = Services(archive)
+    try:
+        while not stop.is_set():
+            started_at = time.monotonic()
+            try:
+                run_cycle(services, stop)
+            except Exception as e:
+                print(f"Erro no ciclo: {str(e)}")
+            elapsed = time.monotonic() - started_at
+            wait = interval - elapsed
+            next_due = services.scheduler.seconds_until_next() if services.scheduler else None
+            if next_due is not None:
+                wait = min(wait, next_due)
+            stop.wait(max(1.0, wait))
+    finally:
+        services.close()
+        profiler.dump()
+        print("Serviço encerrado")
+
+
+def main(archive: Optional[CaptureArchive] = None):
+    stop = install_stop_handler()
+    services = Services(archive)
+    try:
+        run_cycle(services, stop)
+    finally:
+        services.close()
+        profiler.dump()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Envia notícias de criptomoedas para o WhatsApp")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Roda continuamente, reaproveitando navegador, sessões e banco entre os ciclos")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                        help="Intervalo em segundos entre os ciclos no modo daemon")
+    parser.add_argument("--record", metavar="ARQUIVO",
+                        help="Grava o XML dos feeds e as imagens baixadas neste arquivo zip")
+    parser.add_argument("--profile", metavar="DIRETORIO",
+                        help="Grava um perfil do cProfile por etapa (feeds, storage, images, delivery) neste diretório")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
+        print(f"Métricas disponíveis em http://localhost:{METRICS_PORT}/metrics")
+    if args.profile:
+        profiler.enable(args.profile)
+    archive = CaptureArchive(args.record, RECORD) if args.record else None
+    if args.daemon:
+        run_daemon(args.interval, archive)
+    else:
+        main(archive)
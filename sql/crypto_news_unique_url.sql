@@ -0,0 +1,24 @@
+-- Restrição UNIQUE na coluna url da tabela "crypto-news", exigida pelo insert
+-- idempotente (upsert com on_conflict=url) de STORAGE_BACKEND=supabase.
+-- Execute uma vez no SQL Editor do Supabase (ou com psql); pode ser repetido sem efeito.
+
+begin;
+
+-- Remove as notícias duplicadas, mantendo a primeira linha gravada de cada url
+delete from "crypto-news" newer
+using "crypto-news" older
+where newer.url = older.url
+  and newer.ctid > older.ctid;
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conname = 'crypto_news_url_key' and conrelid = '"crypto-news"'::regclass
+    ) then
+        alter table "crypto-news" add constraint crypto_news_url_key unique (url);
+    end if;
+end
+$$;
+
+commit;
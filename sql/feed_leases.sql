@@ -0,0 +1,94 @@
+-- Leases dos feeds para LEASE_BACKEND=supabase.
+-- Execute uma vez no SQL Editor do Supabase (ou com psql) antes de iniciar os workers.
+
+create table if not exists feed_lease_workers (
+    worker_id text primary key,
+    heartbeat_at timestamptz not null
+);
+
+-- Leases vencidos ou liberados continuam na tabela com o último dono do feed
+create table if not exists feed_leases (
+    feed text primary key,
+    worker_id text not null,
+    expires_at timestamptz not null
+);
+
+create index if not exists feed_leases_worker on feed_leases (worker_id);
+
+-- Renova o heartbeat e os leases do worker e reivindica feeds livres até a parte
+-- justa, ceil(feeds / workers vivos). Mesma regra de plan_claim em
+-- utils/coordination/leases.py. Retorna os feeds do worker, na ordem de p_feeds, e
+-- se cada um tinha outro worker como último dono.
+drop function if exists claim_feed_leases(text, text[], double precision);
+create or replace function claim_feed_leases(p_worker_id text, p_feeds text[], p_ttl_seconds double precision)
+returns table (leased_feed text, acquired boolean)
+language plpgsql
+as $$
+declare
+    v_now timestamptz := clock_timestamp();
+    v_ttl interval := make_interval(secs => p_ttl_seconds);
+    v_share integer;
+    v_owned text[];
+    v_acquired text[];
+begin
+    -- Serializa as reivindicações de todos os workers até o fim da transação
+    lock table feed_leases in share row exclusive mode;
+
+    insert into feed_lease_workers (worker_id, heartbeat_at) values (p_worker_id, v_now)
+    on conflict (worker_id) do update set heartbeat_at = excluded.heartbeat_at;
+    delete from feed_lease_workers where heartbeat_at < v_now - v_ttl;
+
+    v_share := ceil(coalesce(array_length(p_feeds, 1), 0)::numeric
+                    / greatest(1, (select count(*) from feed_lease_workers)));
+
+    -- Feeds que já são deste worker, na ordem da configuração, até a parte justa
+    select coalesce(array_agg(mine.feed order by mine.ord), '{}') into v_owned
+    from (
+        select f.feed, f.ord
+        from unnest(p_feeds) with ordinality as f(feed, ord)
+        join feed_leases l on l.feed = f.feed and l.worker_id = p_worker_id and l.expires_at >= v_now
+        order by f.ord
+        limit v_share
+    ) mine;
+
+    -- Libera o excedente e os feeds removidos da configuração
+    update feed_leases l set expires_at = '-infinity'
+    where l.worker_id = p_worker_id and l.expires_at >= v_now and not (l.feed = any(v_owned));
+
+    -- Completa a parte justa com feeds livres
+    v_owned := v_owned || coalesce((
+        select array_agg(free.feed order by free.ord)
+        from (
+            select f.feed, f.ord
+            from unnest(p_feeds) with ordinality as f(feed, ord)
+            where not exists (select 1 from feed_leases l where l.feed = f.feed and l.expires_at >= v_now)
+            order by f.ord
+            limit greatest(0, v_share - coalesce(array_length(v_owned, 1), 0))
+        ) free
+    ), '{}');
+
+    -- Feeds que tinham outro worker como último dono, antes de renovar os leases
+    select coalesce(array_agg(l.feed), '{}') into v_acquired
+    from feed_leases l
+    where l.feed = any(v_owned) and l.worker_id <> p_worker_id;
+
+    insert into feed_leases (feed, worker_id, expires_at)
+    select owned.feed, p_worker_id, v_now + v_ttl from unnest(v_owned) as owned(feed)
+    on conflict (feed) do update set worker_id = excluded.worker_id, expires_at = excluded.expires_at;
+
+    return query
+    select owned.feed, owned.feed = any(v_acquired)
+    from unnest(v_owned) with ordinality as owned(feed, ord)
+    order by owned.ord;
+end;
+$$;
+
+-- Libera os leases e o heartbeat do worker (ao encerrar o processo). Os leases
+-- continuam na tabela, vencidos, com o último dono do feed
+create or replace function release_feed_leases(p_worker_id text)
+returns void
+language sql
+as $$
+    update feed_leases set expires_at = '-infinity' where worker_id = p_worker_id;
+    delete from feed_lease_workers where worker_id = p_worker_id;
+$$;
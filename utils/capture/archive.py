@@ -0,0 +1,152 @@
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+RECORD = "record"
+REPLAY = "replay"
+MANIFEST = "manifest.json"
+# Estado local no início do ciclo gravado, usado para reproduzi-lo no replay
+CYCLE = "cycle.json"
+
+
+def _entry_name(kind: str, url: str) -> str:
+    return f"{kind}/{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}"
+
+
+class CaptureArchive:
+    """
+    Arquivo zip com o conteúdo bruto de um ciclo: o XML de cada feed e os bytes
+    de cada imagem, indexados pela URL em um manifest.
+
+    No modo `record` o FeedParser e o ImageScraper gravam o que baixam; no modo
+    `replay` eles leem daqui em vez da rede, passando pelos mesmos caminhos de
+    parsing e de imagem. O XML é comprimido; as imagens, que já são comprimidas,
+    são guardadas sem compressão.
+
+    Para que o replay encontre as mesmas notícias novas, a captura também guarda
+    o estado local do primeiro ciclo gravado (`record_cycle`): as URLs que ele
+    encontrou como novas e as notícias que já estavam pendentes no Outbox.
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Modo de captura inválido: {mode} (use {RECORD} ou {REPLAY})")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        # url -> {"kind", "name", ...}
+        self._manifest: Dict[str, Dict] = {}
+        self._cycle: Optional[Dict[str, Any]] = None
+        if mode == RECORD:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._zip = zipfile.ZipFile(path, "w")
+        else:
+            self._zip = zipfile.ZipFile(path, "r")
+            self._manifest = json.loads(self._zip.read(MANIFEST))
+            if CYCLE in self._zip.namelist():
+                self._cycle = json.loads(self._zip.read(CYCLE))
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    @property
+    def rss_feeds(self) -> List[Dict[str, str]]:
+        """Feeds gravados, no formato de `rss_feeds`."""
+        return [{item["source"]: url} for url, item in self._manifest.items() if item["kind"] == "feeds"]
+
+    @property
+    def new_urls(self) -> Optional[List[str]]:
+        """URLs encontradas como novas no ciclo gravado (None em capturas sem esse registro)."""
+        return self._cycle["new_urls"] if self._cycle is not None else None
+
+    @property
+    def pending_news(self) -> List[Dict[str, Any]]:
+        """Notícias que já estavam pendentes no Outbox no início do ciclo gravado, como dicionários."""
+        return self._cycle["pending"] if self._cycle is not None else []
+
+    def _write(self, kind: str, url: str, data: bytes, compress: bool, **metadata):
+        name = _entry_name(kind, url)
+        with self._lock:
+            if url in self._manifest:
+                return
+            compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            self._zip.writestr(name, data, compress_type=compression)
+            self._manifest[url] = {"kind": kind, "name": name, "bytes": len(data), **metadata}
+
+    def _read(self, kind: str, url: str) -> Optional[Tuple[bytes, Dict]]:
+        item = self._manifest.get(url)
+        if item is None or item["kind"] != kind:
+            return None
+        with self._lock:
+            return self._zip.read(item["name"]), item
+
+    def record_feed(self, source: str, url: str, response: requests.Response):
+        self._write("feeds", url, response.content, True, source=source,
+                    content_type=response.headers.get("Content-Type"))
+
+    def record_image(self, url: str, image_bytes: bytes, image_format: str):
+        self._write("images", url, image_bytes, False, format=image_format)
+
+    def record_cycle(self, new_news: List[Any], pending_news: List[Any]):
+        """
+        Guarda as notícias novas encontradas no ciclo e as que já estavam pendentes
+        no Outbox. Só o primeiro ciclo é guardado, pois é ele que o replay reexecuta.
+        """
+        with self._lock:
+            if self._cycle is not None:
+                return
+            self._cycle = {
+                "new_urls": [news.url for news in new_news],
+                "pending": [dataclasses.asdict(news) for news in pending_news],
+            }
+
+    def feed_response(self, url: str) -> requests.Response:
+        """
+        Monta a resposta HTTP do feed a partir do arquivo.
+        
+        Raises:
+            requests.RequestException: se o feed não foi gravado
+        """
+        entry = self._read("feeds", url)
+        if entry is None:
+            raise requests.RequestException(f"feed não encontrado na captura: {url}")
+        content, item = entry
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = content
+        if item.get("content_type"):
+            response.headers["Content-Type"] = item["content_type"]
+        return response
+
+    def image(self, url: str) -> Optional[Tuple[bytes, str]]:
+        entry = self._read("images", url)
+        if entry is None:
+            return None
+        content, item = entry
+        return content, item["format"]
+
+    def close(self):
+        with self._lock:
+            if self._zip is None:
+                return
+            if self.recording:
+                self._zip.writestr(MANIFEST, json.dumps(self._manifest, indent=1))
+                if self._cycle is not None:
+                    self._zip.writestr(CYCLE, json.dumps(self._cycle, ensure_ascii=False),
+                                       compress_type=zipfile.ZIP_DEFLATED)
+            self._zip.close()
+            self._zip = None
@@ -0,0 +1,123 @@
+import math
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from utils.state.state import load_json, save_json, state_path
+
+# Onde ficam os leases dos feeds: supabase (no mesmo banco das notícias, para várias
+# máquinas) ou sqlite (arquivo local, para testes e várias instâncias no mesmo host).
+# Vazio = sem coordenação, um único worker
+LEASE_BACKEND = os.getenv("LEASE_BACKEND", "sqlite" if os.getenv("LEASE_DB_PATH") else "").lower()
+# Validade (em segundos) do lease de um feed e do heartbeat de um worker
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "900"))
+# Identificador deste worker. Sem WORKER_ID, é gerado uma vez e guardado em STATE_DIR,
+# de modo que o worker continua sendo o dono anterior dos seus feeds depois de reiniciar
+WORKER_ID = os.getenv("WORKER_ID", "")
+WORKER_ID_PATH = state_path("worker_id.json")
+
+
+def local_worker_id(path: str = WORKER_ID_PATH) -> str:
+    """Identificador guardado no estado local; criado na primeira execução."""
+    worker_id = load_json(path, "identificador do worker")
+    if not isinstance(worker_id, str) or not worker_id:
+        worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        save_json(path, worker_id)
+    return worker_id
+
+
+def plan_claim(feeds: List[str], leases: Dict[str, str], worker_id: str,
+               live_workers: int) -> Tuple[List[str], List[str]]:
+    """
+    Decide quais feeds o worker fica e quais libera, dada a situação atual dos leases.
+
+    O worker mantém os feeds que já são seus até a parte justa, ceil(feeds / workers
+    vivos), e completa a parte com feeds livres. Os leases acima da parte justa ou
+    de feeds removidos da configuração são liberados.
+
+    Args:
+        feeds: Todos os feeds configurados, na ordem da configuração
+        leases: Leases válidos, no formato {feed: worker_id}
+        worker_id: Worker que está reivindicando
+        live_workers: Número de workers com heartbeat válido (incluindo este)
+
+    Returns:
+        (feeds deste worker, feeds cujos leases devem ser liberados)
+    """
+    share = math.ceil(len(feeds) / max(1, live_workers))
+    feed_set = set(feeds)
+    owned = [feed for feed in feeds if leases.get(feed) == worker_id]
+    released = [feed for feed, worker in leases.items() if worker == worker_id and feed not in feed_set]
+    released += owned[share:]
+    owned = owned[:share]
+    free = [feed for feed in feeds if feed not in leases][:max(0, share - len(owned))]
+    return owned + free, released
+
+
+class FeedLeases(ABC):
+    """
+    Interface dos backends que dividem os feeds entre vários workers por meio de
+    leases com prazo de validade.
+
+    A cada ciclo o worker renova o próprio heartbeat e os leases que já tem, e
+    reivindica feeds livres (ou com lease vencido) até a sua parte justa (veja
+    `plan_claim`), tudo em uma única transação. Se houver mais workers do que
+    antes, quem tem feeds demais libera o excedente; se um worker morrer, seus
+    leases vencem após `ttl` segundos e são assumidos pelos demais.
+
+    Leases liberados ou vencidos continuam guardando o último dono do feed, e a
+    reivindicação informa quais feeds vieram de outro worker: este não viu as
+    notícias que o outro enviou, então o ponto de partida desses feeds vem do banco.
+    Cada instância precisa do seu próprio STATE_DIR, onde fica o identificador.
+
+    O `ttl` precisa ser maior que a duração de um ciclo mais o intervalo entre ciclos.
+    """
+
+    def __init__(self, worker_id: str = WORKER_ID, ttl: float = LEASE_TTL_SECONDS):
+        self.worker_id = worker_id or local_worker_id()
+        self.ttl = ttl
+
+    @abstractmethod
+    def _claim(self, feeds: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Renova o heartbeat e os leases deste worker em uma transação.
+        Retorna os feeds dele e, entre eles, os que tinham outro worker como último dono.
+        """
+
+    @abstractmethod
+    def _release(self):
+        """Remove os leases e o heartbeat deste worker."""
+
+    def claim(self, feeds: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Renova e reivindica os leases deste worker.
+
+        Returns:
+            (feeds deste worker, feeds assumidos de outro worker)
+        """
+        return self._claim(feeds)
+
+    def release_all(self):
+        """Libera os leases deste worker para que os demais assumam os feeds imediatamente."""
+        self._release()
+
+    def close(self):
+        try:
+            self.release_all()
+        except Exception as e:
+            print(f"Erro ao liberar os leases dos feeds: {str(e)}")
+
+
+def create_leases(backend: str = LEASE_BACKEND) -> Optional[FeedLeases]:
+    """Cria o backend de leases configurado em LEASE_BACKEND (None = sem coordenação)."""
+    if not backend:
+        return None
+    if backend == "sqlite":
+        from utils.coordination.sqlite_leases import SQLiteFeedLeases
+        return SQLiteFeedLeases()
+    if backend == "supabase":
+        from utils.coordination.supabase_leases import SupabaseFeedLeases
+        return SupabaseFeedLeases()
+    raise ValueError(f"LEASE_BACKEND inválido: {backend} (use supabase ou sqlite)")
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+from utils.coordination.leases import FeedLeases, LEASE_TTL_SECONDS, WORKER_ID, plan_claim
+
+# Arquivo SQLite compartilhado pelos workers do mesmo host. Não use em volumes de
+# rede (NFS, SMB): o lock do SQLite não é confiável neles; use LEASE_BACKEND=supabase
+LEASE_DB_PATH = os.getenv("LEASE_DB_PATH", "")
+
+
+class SQLiteFeedLeases(FeedLeases):
+    """
+    Leases dos feeds em um arquivo SQLite (modo WAL), para testes e para várias
+    instâncias no mesmo host. As transações são abertas com BEGIN IMMEDIATE, o que
+    serializa as reivindicações dos workers.
+    """
+
+    def __init__(self, path: str = LEASE_DB_PATH, worker_id: str = WORKER_ID,
+                 ttl: float = LEASE_TTL_SECONDS):
+        super().__init__(worker_id, ttl)
+        if not path:
+            raise ValueError("LEASE_DB_PATH deve estar definida com LEASE_BACKEND=sqlite")
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # isolation_level=None: as transações são abertas manualmente com BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS feed_leases (
+                feed TEXT PRIMARY KEY,
+                worker_id TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS feed_leases_worker ON feed_leases (worker_id)")
+
+    def _claim(self, feeds: List[str]) -> Tuple[List[str], List[str]]:
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO workers (worker_id, heartbeat_at) VALUES (?, ?) "
+                    "ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                    (self.worker_id, now)
+                )
+                conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - self.ttl,))
+                live_workers = conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+                # Leases vencidos ou liberados continuam na tabela com o último dono do feed
+                last_owners = {}
+                leases = {}
+                for feed, worker_id, expires_at in conn.execute("SELECT feed, worker_id, expires_at FROM feed_leases"):
+                    last_owners[feed] = worker_id
+                    if expires_at >= now:
+                        leases[feed] = worker_id
+
+                owned, released = plan_claim(feeds, leases, self.worker_id, live_workers)
+                conn.executemany("UPDATE feed_leases SET expires_at = 0 WHERE feed = ?", [(feed,) for feed in released])
+                conn.executemany(
+                    "INSERT INTO feed_leases (feed, worker_id, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(feed) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at",
+                    [(feed, self.worker_id, now + self.ttl) for feed in owned]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            acquired = [feed for feed in owned if last_owners.get(feed, self.worker_id) != self.worker_id]
+            return owned, acquired
+
+    def _release(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("UPDATE feed_leases SET expires_at = 0 WHERE worker_id = ?", (self.worker_id,))
+                self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._conn.close()
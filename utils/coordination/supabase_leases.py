@@ -0,0 +1,45 @@
+import os
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+
+from utils.coordination.leases import FeedLeases, LEASE_TTL_SECONDS, WORKER_ID
+
+
+class SupabaseFeedLeases(FeedLeases):
+    """
+    Leases dos feeds no Postgres do Supabase, o mesmo banco das notícias, para
+    workers em máquinas diferentes.
+
+    Cada reivindicação é uma única chamada à função claim_feed_leases (veja
+    sql/feed_leases.sql), que trava a tabela feed_leases durante a transação e
+    aplica a mesma regra de `plan_claim`. Os prazos usam o relógio do banco, então
+    diferenças de horário entre as máquinas não afetam os leases.
+    """
+
+    def __init__(self, worker_id: str = WORKER_ID, ttl: float = LEASE_TTL_SECONDS):
+        super().__init__(worker_id, ttl)
+        load_dotenv()
+        url: str = os.getenv("SUPABASE_URL")
+        key: str = os.getenv("SUPABASE_KEY")
+
+        if not url or not key:
+            raise ValueError("SUPABASE_URL e SUPABASE_KEY devem estar definidas no arquivo .env")
+
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def _claim(self, feeds: List[str]) -> Tuple[List[str], List[str]]:
+        result = self.client.rpc('claim_feed_leases', {
+            'p_worker_id': self.worker_id,
+            'p_feeds': feeds,
+            'p_ttl_seconds': self.ttl,
+        }).execute()
+        rows = result.data or []
+        owned = {row['leased_feed'] for row in rows}
+        acquired = {row['leased_feed'] for row in rows if row['acquired']}
+        # Mantém a ordem da configuração
+        return [feed for feed in feeds if feed in owned], [feed for feed in feeds if feed in acquired]
+
+    def _release(self):
+        self.client.rpc('release_feed_leases', {'p_worker_id': self.worker_id}).execute()
@@ -1,11 +1,13 @@
-from supabase import create_client
 from dotenv import load_dotenv
 import os
-from typing import List, Optional, Dict
-from utils.rss.feed_parser import News
+from typing import List, Dict
+from utils.database.storage import NewsStorage, DB_INSERT_CHUNK_SIZE
 
-class Database:
-    def __init__(self):
+class Database(NewsStorage):
+    """Armazenamento das notícias no Supabase (PostgREST)."""
+
+    def __init__(self, chunk_size: int = DB_INSERT_CHUNK_SIZE):
+        super().__init__(chunk_size)
         # Carregar variáveis de ambiente
         load_dotenv()
         
@@ -16,51 +18,28 @@ class Database:
         if not url or not key:
             raise ValueError("SUPABASE_URL e SUPABASE_KEY devem estar definidas no arquivo .env")
         
+        # O cliente do Supabase é pesado para importar; só carrega quando o banco é usado
+        from supabase import create_client
         self.client = create_client(url, key)
         self.table_name = "crypto-news"  # Nome da tabela no Supabase
 
-    def insert_news(self, news: News) -> Dict:
+    def _execute(self, operation: str, query, **attributes):
         """
-        Insere uma nova notícia no banco de dados.
-        Retorna os dados inseridos.
+        Executa a query do Supabase registrando tempo, resultado e um span de tracing.
         """
-        data = {
-            "title": news.title,
-            "url": news.url,
-            "source": news.source,
-            "published_time": news.published_time,
-            "summary": news.summary,
-            "image_url": news.image_url,
-            "image_format": news.image_format
-        }
-        
-        result = self.client.table(self.table_name).insert(data).execute()
-        return result.data
+        return self._call(operation, query.execute, **attributes)
 
-    def insert_many_news(self, news_list: List[News]) -> List[Dict]:
-        """
-        Insere várias notícias no banco de dados.
-        Retorna a lista de dados inseridos.
-        """
-        data = [{
-            "title": news.title,
-            "url": news.url,
-            "source": news.source,
-            "published_time": news.published_time,
-            "summary": news.summary,
-            "image_url": news.image_url,
-            "image_format": news.image_format
-        } for news in news_list]
-        
-        result = self.client.table(self.table_name).insert(data).execute()
-        return result.data
+    def _upsert_rows(self, rows: List[Dict]) -> List[Dict]:
+        # Requer uma restrição UNIQUE na coluna url; URLs existentes são ignoradas
+        query = self.client.table(self.table_name).upsert(rows, on_conflict="url", ignore_duplicates=True)
+        return self._execute("insert", query, rows=len(rows)).data
 
-    def get_latest_news_per_source(self) -> Dict[str, str]:
+    def _load_watermarks(self) -> Dict[str, str]:
         """
-        Retorna as últimas notícias por fonte usando a stored procedure get_latest_news_per_source.
-        Retorna um dicionário no formato {"source1": "time1", "source2": "time2", ...}
+        Consulta as últimas notícias por fonte usando a stored procedure get_latest_news_per_source.
         """
-        result = self.client.rpc('get_latest_news_per_source').execute()
+        result = self._execute("rpc", self.client.rpc('get_latest_news_per_source'),
+                               function="get_latest_news_per_source")
         data = result.data
     
         # Formatar os dados no formato de dicionário
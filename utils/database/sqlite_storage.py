@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from utils.database.storage import NewsStorage, DB_INSERT_CHUNK_SIZE
+from utils.state.state import state_path
+
+# Arquivo do banco local de notícias
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", state_path("news.sqlite3"))
+
+COLUMNS = ("title", "url", "source", "published_time", "summary", "image_url", "image_format")
+# Parâmetros por consulta aceitos por qualquer versão do SQLite
+SQLITE_MAX_VARIABLES = 999
+
+
+class SQLiteStorage(NewsStorage):
+    """
+    Armazenamento local das notícias em SQLite (modo WAL), sem chamadas de rede.
+
+    A URL é a chave primária, o que torna os inserts idempotentes, e o índice
+    (source, published_time) atende a consulta do horário da última notícia por fonte.
+    """
+
+    def __init__(self, path: str = STORAGE_SQLITE_PATH, chunk_size: int = DB_INSERT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS news (
+                url TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                source TEXT NOT NULL,
+                published_time TEXT NOT NULL,
+                summary TEXT,
+                image_url TEXT,
+                image_format TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS news_source_time ON news (source, published_time)")
+        self._conn.commit()
+
+    def _upsert_rows(self, rows: List[Dict]) -> List[Dict]:
+        def upsert():
+            now = time.time()
+            urls = [row["url"] for row in rows]
+            with self._lock, self._conn:
+                # Reserva a escrita já na leitura, para que nenhum outro processo grave
+                # entre a consulta das URLs existentes e o insert
+                self._conn.execute("BEGIN IMMEDIATE")
+                existing = set()
+                for start in range(0, len(urls), SQLITE_MAX_VARIABLES):
+                    batch = urls[start:start + SQLITE_MAX_VARIABLES]
+                    existing.update(url for (url,) in self._conn.execute(
+                        f"SELECT url FROM news WHERE url IN ({', '.join('?' * len(batch))})", batch
+                    ))
+                inserted = []
+                for row in rows:
+                    # Também descarta URLs repetidas dentro do próprio bloco
+                    if row["url"] not in existing:
+                        existing.add(row["url"])
+                        inserted.append(row)
+                self._conn.executemany(
+                    f"INSERT INTO news ({', '.join(COLUMNS)}, created_at) "
+                    f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))}) ON CONFLICT(url) DO NOTHING",
+                    [[row[column] for column in COLUMNS] + [now] for row in inserted]
+                )
+            return inserted
+
+        return self._call("insert", upsert, rows=len(rows))
+
+    def _load_watermarks(self) -> Dict[str, str]:
+        def query():
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT source, MAX(published_time) FROM news GROUP BY source"
+                ).fetchall()
+
+        return dict(self._call("watermarks", query))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,116 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+from utils.rss.feed_parser import News
+from utils.metrics.metrics import span, DB_CALL_SECONDS, DB_CALLS_TOTAL
+
+# Backend de armazenamento das notícias: supabase ou sqlite
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+# Número máximo de notícias por insert
+DB_INSERT_CHUNK_SIZE = int(os.getenv("DB_INSERT_CHUNK_SIZE", "500"))
+
+
+def news_to_row(news: News) -> Dict:
+    return {
+        "title": news.title,
+        "url": news.url,
+        "source": news.source,
+        "published_time": news.published_time,
+        "summary": news.summary,
+        "image_url": news.image_url,
+        "image_format": news.image_format
+    }
+
+
+class NewsStorage(ABC):
+    """
+    Interface dos backends que guardam as notícias publicadas.
+
+    Os inserts são feitos em blocos de até `chunk_size` notícias e são
+    idempotentes (URLs já gravadas são ignoradas). O horário da última notícia
+    de cada fonte é lido do banco uma única vez e depois mantido em memória,
+    atualizado a cada insert (write-through).
+    """
+
+    def __init__(self, chunk_size: int = DB_INSERT_CHUNK_SIZE):
+        self.chunk_size = max(1, chunk_size)
+        self._watermarks: Optional[Dict[str, str]] = None
+        self._watermarks_lock = threading.Lock()
+
+    def _call(self, operation: str, func: Callable, **attributes):
+        """Executa a chamada ao banco registrando tempo, resultado e um span de tracing."""
+        with span(f"db.{operation}", DB_CALL_SECONDS, operation=operation, **attributes) as current:
+            try:
+                result = func()
+            except Exception:
+                current.set(result="error")
+                DB_CALLS_TOTAL.inc(operation=operation, result="error")
+                raise
+            current.set(result="ok")
+            DB_CALLS_TOTAL.inc(operation=operation, result="ok")
+            return result
+
+    @abstractmethod
+    def _upsert_rows(self, rows: List[Dict]) -> List[Dict]:
+        """Grava um bloco de notícias ignorando URLs existentes; retorna as linhas gravadas."""
+
+    @abstractmethod
+    def _load_watermarks(self) -> Dict[str, str]:
+        """Consulta no banco o horário da última notícia de cada fonte."""
+
+    def insert_news(self, news: News) -> List[Dict]:
+        """
+        Insere uma nova notícia no banco de dados.
+        Retorna os dados inseridos.
+        """
+        return self.insert_many_news([news])
+
+    def insert_many_news(self, news_list: List[News]) -> List[Dict]:
+        """
+        Insere várias notícias no banco de dados, em blocos e sem duplicar URLs.
+        Retorna a lista de dados inseridos.
+        """
+        inserted = []
+        for start in range(0, len(news_list), self.chunk_size):
+            chunk = news_list[start:start + self.chunk_size]
+            inserted.extend(self._upsert_rows([news_to_row(news) for news in chunk]) or [])
+            self._advance_watermarks(chunk)
+        return inserted
+
+    def _advance_watermarks(self, news_list: List[News]):
+        with self._watermarks_lock:
+            if self._watermarks is None:
+                return
+            for news in news_list:
+                if news.published_time > self._watermarks.get(news.source, ""):
+                    self._watermarks[news.source] = news.published_time
+
+    def get_latest_news_per_source(self, refresh: bool = False) -> Dict[str, str]:
+        """
+        Retorna o horário da última notícia por fonte.
+        Retorna um dicionário no formato {"source1": "time1", "source2": "time2", ...}
+        
+        Args:
+            refresh: Consulta o banco mesmo com os horários em memória (ex: quando
+                     outro processo também grava no banco)
+        """
+        with self._watermarks_lock:
+            if self._watermarks is None or refresh:
+                self._watermarks = self._load_watermarks()
+            return dict(self._watermarks)
+
+    def close(self):
+        pass
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> NewsStorage:
+    """Cria o backend de armazenamento configurado em STORAGE_BACKEND."""
+    if backend == "sqlite":
+        from utils.database.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    if backend == "supabase":
+        from utils.database.database import Database
+        return Database()
+    raise ValueError(f"STORAGE_BACKEND inválido: {backend} (use supabase ou sqlite)")
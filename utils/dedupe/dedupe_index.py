@@ -0,0 +1,170 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from utils.state.state import state_path
+
+# Arquivo SQLite do índice de notícias já vistas
+DEDUPE_INDEX_PATH = os.getenv("DEDUPE_INDEX_PATH", state_path("dedupe.sqlite3"))
+# Por quantos dias uma URL vista continua no índice
+DEDUPE_RETENTION_DAYS = float(os.getenv("DEDUPE_RETENTION_DAYS", "30"))
+# Usa um filtro de Bloom em memória na frente do índice (1 = sim, 0 = não)
+DEDUPE_USE_BLOOM = os.getenv("DEDUPE_USE_BLOOM", "1") == "1"
+
+# Parâmetros de rastreamento que não mudam o conteúdo da página
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normaliza a URL para que variações do mesmo link gerem o mesmo hash:
+    esquema e host em minúsculas, sem fragmento, sem parâmetros de rastreamento,
+    query ordenada e sem barra final.
+    """
+    parts = urlsplit(url.strip())
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def url_hash(url: str) -> str:
+    """Hash curto e estável da URL normalizada."""
+    return hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom simples: responde "com certeza não está" ou "talvez esteja".
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DedupeIndex:
+    """
+    Índice local e persistente das notícias já vistas, indexado pelo hash da URL normalizada.
+
+    Substitui o filtro por horário de publicação: cada verificação é O(1), não
+    depende do banco remoto e não perde notícias publicadas no mesmo minuto ou
+    com data retroativa. Entradas mais antigas que `retention_days` são removidas.
+
+    Guarda também quais feeds têm histórico no índice: só para esses as URLs vistas
+    bastam para encontrar as notícias novas; os demais partem do banco.
+    """
+
+    def __init__(self, path: str = DEDUPE_INDEX_PATH, retention_days: float = DEDUPE_RETENTION_DAYS,
+                 use_bloom: bool = DEDUPE_USE_BLOOM):
+        self.path = path
+        self.retention_seconds = retention_days * 24 * 3600
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (hash TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS seen_seen_at ON seen (seen_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS feeds (feed TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        self._conn.commit()
+        self.prune()
+
+        self.bloom: Optional[BloomFilter] = None
+        if use_bloom:
+            self._build_bloom()
+
+    def _build_bloom(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+            self.bloom = BloomFilter(capacity=max(10_000, count * 2))
+            for (key,) in self._conn.execute("SELECT hash FROM seen"):
+                self.bloom.add(key)
+
+    def known_feeds(self) -> Set[str]:
+        """Feeds cujas entradas já foram registradas no índice."""
+        with self._lock:
+            return {feed for (feed,) in self._conn.execute("SELECT feed FROM feeds")}
+
+    def add_feeds(self, feeds: Iterable[str]):
+        """Registra que as entradas dos feeds estão no índice."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO feeds (feed, seen_at) VALUES (?, ?) "
+                "ON CONFLICT(feed) DO UPDATE SET seen_at = excluded.seen_at",
+                [(feed, now) for feed in feeds]
+            )
+            self._conn.commit()
+
+    def forget_feeds(self, feeds: Iterable[str]):
+        """Remove o histórico dos feeds, que voltam a partir do banco."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM feeds WHERE feed = ?", [(feed,) for feed in feeds])
+            self._conn.commit()
+
+    def contains(self, url: str) -> bool:
+        """Retorna True se a URL já foi vista."""
+        key = url_hash(url)
+        if self.bloom is not None and key not in self.bloom:
+            return False
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM seen WHERE hash = ?", (key,)).fetchone() is not None
+
+    __contains__ = contains
+
+    def add_many(self, urls: Iterable[str]):
+        """Marca as URLs como vistas."""
+        now = time.time()
+        keys = [url_hash(url) for url in urls]
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (hash, seen_at) VALUES (?, ?)",
+                [(key, now) for key in keys]
+            )
+            self._conn.commit()
+            if self.bloom is not None:
+                for key in keys:
+                    self.bloom.add(key)
+
+    def prune(self):
+        """
+        Remove as entradas mais antigas que o período de retenção. Um feed sem
+        notícias novas nesse período perde o histórico e volta a partir do banco.
+        """
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            self._conn.execute("DELETE FROM seen WHERE seen_at < ?", (cutoff,))
+            self._conn.execute("DELETE FROM feeds WHERE seen_at < ?", (cutoff,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
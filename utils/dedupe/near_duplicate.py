@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from utils.rss.feed_parser import News
+
+# Janela (em horas) em que uma notícia é comparada com as anteriores
+NEAR_DUPLICATE_WINDOW_HOURS = float(os.getenv("NEAR_DUPLICATE_WINDOW_HOURS", "6"))
+# Similaridade de Jaccard mínima entre as palavras dos títulos para considerar duplicata.
+# Com 0.6, dois títulos de 6 palavras relevantes precisam compartilhar 5 delas
+NEAR_DUPLICATE_MIN_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_MIN_SIMILARITY", "0.6"))
+# Títulos com menos palavras relevantes que isso nunca são considerados duplicatas
+NEAR_DUPLICATE_MIN_TOKENS = int(os.getenv("NEAR_DUPLICATE_MIN_TOKENS", "4"))
+
+# Palavras comuns (já sem acento) que não ajudam a distinguir uma notícia de outra
+STOPWORDS = frozenset({
+    "para", "com", "que", "uma", "uns", "umas", "por", "pela", "pelo", "pelas", "pelos",
+    "dos", "das", "nos", "nas", "num", "numa", "nao", "mais", "menos", "como", "sobre",
+    "apos", "ate", "entre", "sem", "seu", "sua", "seus", "suas", "sao", "foi", "ser",
+    "esta", "este", "isso", "essa", "esse", "diz", "tem", "quando", "onde", "ainda",
+    "the", "and", "for", "with", "from", "that", "this", "are", "was", "its", "has",
+    "have", "after", "over", "into", "than", "what", "why", "how", "will", "new",
+})
+
+# Palavras (já sem acento) que dizem o que aconteceu. Títulos que diferem nelas são
+# notícias diferentes ("Bitcoin sobe após..." e "Bitcoin cai após...", "SEC aprova ETF"
+# e "SEC adia decisão sobre ETF"), então são palavras-chave em qualquer título
+EVENT_WORDS = frozenset({
+    "sobe", "sobem", "subir", "alta", "dispara", "disparam", "salta", "saltam", "avanca", "avancam",
+    "cai", "caem", "cair", "queda", "despenca", "despencam", "recua", "recuam", "tomba", "tombam",
+    "aprova", "aprovam", "aprovado", "aprovada", "aprovacao", "rejeita", "rejeitam", "rejeitado",
+    "rejeitada", "nega", "negam", "adia", "adiam", "adiado", "adiada", "adiamento", "suspende",
+    "suspendem", "suspenso", "suspensa", "libera", "liberam", "proibe", "proibem", "proibicao",
+    "lista", "listam", "listagem", "remove", "removem", "deslista", "deslistam", "delista",
+    "compra", "compram", "vende", "vendem", "venda", "vendas", "lanca", "lancam", "lancamento",
+    "processa", "processam", "multa", "multam", "prende", "preso", "presa", "hack", "hacker",
+    "hackeado", "hackeada", "ataque",
+    "rises", "rise", "surges", "jumps", "soars", "falls", "drops", "plunges", "slides", "slumps",
+    "approves", "approved", "approval", "rejects", "rejected", "denies", "denied", "delays",
+    "delayed", "postpones", "postponed", "suspends", "suspended", "bans", "banned", "lists",
+    "listing", "delists", "removes", "removed", "buys", "sells", "launches", "launched", "sues",
+    "sued", "fines", "fined", "arrested", "hacked", "exploit", "exploited",
+})
+
+
+def title_tokens(title: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    Normaliza o título (minúsculas, sem acentos e pontuação) e retorna o conjunto
+    de palavras relevantes e, dentre elas, as palavras-chave: números, palavras de
+    EVENT_WORDS e nomes próprios (palavras com inicial maiúscula), que identificam o
+    assunto e o fato da notícia. Em títulos com todas as iniciais maiúsculas não há
+    como distinguir os nomes próprios, então quase todas as palavras são chave e só
+    títulos praticamente iguais são considerados a mesma notícia.
+    """
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = [
+        word for word in re.findall(r"[A-Za-z0-9]+", text)
+        if word.isdigit() or (len(word) > 2 and word.lower() not in STOPWORDS)
+    ]
+    keys = [
+        word for word in words
+        if word.isdigit() or word[0].isupper() or word.lower() in EVENT_WORDS
+    ]
+    return frozenset(word.lower() for word in words), frozenset(word.lower() for word in keys)
+
+
+class NearDuplicateDetector:
+    """
+    Detecta a mesma notícia publicada por fontes diferentes.
+
+    Só compara notícias de fontes diferentes: a mesma fonte não publica a mesma
+    notícia duas vezes, e títulos parecidos dela costumam ser a continuação da
+    história ("Binance lista..." e depois "Binance remove...").
+
+    Compara apenas os títulos: os resumos variam muito entre as fontes e diluem a
+    semelhança. Dois títulos são a mesma notícia quando a similaridade de Jaccard
+    entre as palavras passa de `min_similarity` e as palavras-chave de um estão
+    contidas nas do outro, de modo que "Bitcoin cai 5%" e "Ethereum cai 5%", ou
+    "Bitcoin sobe" e "Bitcoin cai", não se confundem. Mantém em memória as palavras
+    dos títulos aceitos nas últimas `window_hours` horas, com um índice invertido
+    (palavra -> urls), e só compara com os títulos que compartilham pelo menos uma palavra.
+    """
+
+    def __init__(self, window_hours: float = NEAR_DUPLICATE_WINDOW_HOURS,
+                 min_similarity: float = NEAR_DUPLICATE_MIN_SIMILARITY,
+                 min_tokens: int = NEAR_DUPLICATE_MIN_TOKENS):
+        self.window_seconds = window_hours * 3600
+        self.min_similarity = min_similarity
+        self.min_tokens = max(1, min_tokens)
+        self._lock = threading.Lock()
+        # (horário, url) na ordem de inserção
+        self._entries: Deque[Tuple[float, str]] = deque()
+        # palavra -> urls
+        self._index: Dict[str, Set[str]] = {}
+        self._tokens: Dict[str, FrozenSet[str]] = {}
+        self._keys: Dict[str, FrozenSet[str]] = {}
+        self._sources: Dict[str, str] = {}
+
+    def _expire_locked(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._entries and self._entries[0][0] < cutoff:
+            _, url = self._entries.popleft()
+            self._keys.pop(url, None)
+            self._sources.pop(url, None)
+            for token in self._tokens.pop(url, ()):
+                urls = self._index.get(token)
+                if urls is not None:
+                    urls.discard(url)
+                    if not urls:
+                        del self._index[token]
+
+    def _find_locked(self, source: str, tokens: FrozenSet[str], keys: FrozenSet[str]) -> Optional[str]:
+        # Quantas palavras cada título candidato de outra fonte tem em comum com o novo
+        shared: Dict[str, int] = {}
+        for token in tokens:
+            for url in self._index.get(token, ()):
+                if self._sources[url] != source:
+                    shared[url] = shared.get(url, 0) + 1
+
+        best_url, best_similarity = None, self.min_similarity
+        for url, intersection in shared.items():
+            other_keys = self._keys[url]
+            if not (keys <= other_keys or other_keys <= keys):
+                continue
+            similarity = intersection / (len(tokens) + len(self._tokens[url]) - intersection)
+            if similarity >= best_similarity:
+                best_url, best_similarity = url, similarity
+        return best_url
+
+    def check_and_add(self, news: News) -> Optional[str]:
+        """
+        Verifica se a notícia é quase duplicata de outra, de outra fonte, dentro da janela.
+
+        Returns:
+            A URL da notícia original se for duplicata; None se for nova
+            (neste caso ela passa a fazer parte do índice)
+        """
+        tokens, keys = title_tokens(news.title or "")
+        # Títulos vazios ou muito curtos não têm informação suficiente para comparar
+        if len(tokens) < self.min_tokens:
+            return None
+
+        now = time.time()
+        with self._lock:
+            self._expire_locked(now)
+            if news.url in self._tokens:
+                return None
+            original = self._find_locked(news.source, tokens, keys)
+            if original is not None:
+                return original
+            self._entries.append((now, news.url))
+            self._tokens[news.url] = tokens
+            self._keys[news.url] = keys
+            self._sources[news.url] = news.source
+            for token in tokens:
+                self._index.setdefault(token, set()).add(news.url)
+        return None
+
+    def filter(self, news_list: List[News]) -> Tuple[List[News], List[Tuple[News, str]]]:
+        """
+        Separa as notícias únicas das quase duplicatas.
+
+        Returns:
+            (notícias únicas, lista de (duplicata, url da original))
+        """
+        unique, duplicates = [], []
+        for news in news_list:
+            original = self.check_and_add(news)
+            if original is None:
+                unique.append(news)
+            else:
+                duplicates.append((news, original))
+        return unique, duplicates
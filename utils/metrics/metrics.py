@@ -0,0 +1,238 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("crypto_news.trace")
+
+# Emite cada span como uma linha JSON no log (1 = sim, 0 = não)
+TRACE_LOGS = os.getenv("TRACE_LOGS", "1") == "1"
+# Porta do endpoint /metrics no formato do Prometheus (vazio = desativado)
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Contador monotônico com labels."""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histograma com buckets cumulativos, soma e contagem por combinação de labels."""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (contagem por bucket, soma, contagem)
+        self._values: Dict[LabelValues, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._values[key] = [counts, total + value, count + 1]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', str(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas exportadas no endpoint /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, documentation, labels, buckets))
+
+    def exposition(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Trecho de execução medido; atributos podem ser adicionados durante o span."""
+
+    def __init__(self, name: str, attributes: Dict):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.duration = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+def current_span() -> Optional[Span]:
+    """Retorna o span ativo no contexto atual, se houver."""
+    return _current_span.get()
+
+
+def annotate(**attributes):
+    """Adiciona atributos ao span ativo; não faz nada fora de um span."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextmanager
+def span(name: str, histogram: Optional[Histogram] = None, **attributes):
+    """
+    Mede o bloco como um span de tracing.
+
+    Ao final, registra a duração no histograma (usando como labels os atributos
+    que o histograma declara) e, se TRACE_LOGS estiver ativo, emite o span como JSON.
+    """
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        if histogram is not None:
+            histogram.observe(current.duration, **{
+                label: current.attributes.get(label, "") for label in histogram.label_names
+            })
+        if TRACE_LOGS:
+            logger.info(json.dumps({
+                "type": "span",
+                "name": current.name,
+                "trace_id": current.trace_id,
+                "span_id": current.span_id,
+                "parent_id": current.parent_id,
+                "start": started_at,
+                "duration_ms": round(current.duration * 1000, 3),
+                "status": current.status,
+                "attributes": current.attributes,
+            }, ensure_ascii=False, default=str))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Sobe o endpoint /metrics em uma thread de fundo."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Métricas das etapas do pipeline
+FEED_FETCH_SECONDS = registry.histogram(
+    "feed_fetch_seconds", "Tempo de download de cada feed", ("source", "result"))
+FEED_FETCH_TOTAL = registry.counter(
+    "feed_fetch_total", "Downloads de feed por resultado (ok, not_modified, error)", ("source", "result"))
+FEED_PARSE_SECONDS = registry.histogram(
+    "feed_parse_seconds", "Tempo de parsing de cada feed", ("source",))
+FEED_ENTRIES_TOTAL = registry.counter(
+    "feed_entries_total", "Entradas processadas por feed", ("source",))
+IMAGE_FETCH_SECONDS = registry.histogram(
+    "image_fetch_seconds", "Tempo para obter a imagem de uma notícia", ("result",))
+IMAGE_CACHE_TOTAL = registry.counter(
+    "image_cache_total", "Consultas ao cache de imagens (hit ou miss)", ("result",))
+IMAGE_BROWSER_FALLBACK_TOTAL = registry.counter(
+    "image_browser_fallback_total", "Imagens baixadas pelo navegador headless")
+DB_CALL_SECONDS = registry.histogram(
+    "db_call_seconds", "Tempo das chamadas ao banco", ("operation", "result"))
+DB_CALLS_TOTAL = registry.counter(
+    "db_calls_total", "Chamadas ao banco por operação e resultado", ("operation", "result"))
+WHATSAPP_SEND_SECONDS = registry.histogram(
+    "whatsapp_send_seconds", "Tempo de envio de cada mensagem ao WhatsApp", ("result",))
+WHATSAPP_SEND_TOTAL = registry.counter(
+    "whatsapp_send_total", "Mensagens enviadas ao WhatsApp por resultado", ("result",))
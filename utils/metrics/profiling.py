@@ -0,0 +1,108 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Até o Python 3.11 o cProfile mede só a thread em que está ativo. A partir do 3.12
+# ele usa sys.monitoring: mede todas as threads e só pode haver um perfil ativo por vez
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class StageProfiler:
+    """
+    Perfis do cProfile separados por etapa do pipeline (feeds, banco, imagens, envio).
+
+    Até o Python 3.11 o cProfile mede só a thread em que está ativo, então cada
+    thread tem o seu perfil por etapa, e as etapas que rodam em pools de threads
+    (download dos feeds, imagens) aparecem separadas. A partir do 3.12 só um perfil
+    fica ativo por vez e ele já mede todas as threads: uma etapa iniciada enquanto
+    outra está ativa conta na que já está ativa (as imagens contam em `delivery`).
+
+    No `dump` os perfis de todas as threads e ciclos são somados e gravados em
+    `<diretório>/<etapa>.prof`, que pode ser aberto com pstats ou snakeviz.
+    Desativado, `stage` não faz nada.
+    """
+
+    def __init__(self):
+        self.directory: Optional[str] = None
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._lock = threading.Lock()
+        self._active = threading.local()
+        # Etapa com perfil ativo no processo (só quando o perfil não é por thread)
+        self._running: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def enable(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    @contextmanager
+    def stage(self, name: str):
+        # Um único perfil ativo por thread: etapas aninhadas contam na etapa externa
+        if not self.enabled or getattr(self._active, "stage", None):
+            yield
+            return
+        with self._lock:
+            if not PER_THREAD_PROFILES:
+                if self._running is not None:
+                    profile = None
+                else:
+                    self._running = name
+                    profile = self._profiles.setdefault((name, 0), cProfile.Profile())
+            else:
+                profile = self._profiles.setdefault((name, threading.get_ident()), cProfile.Profile())
+        if profile is None:
+            # Outra etapa já tem o perfil do processo ativo, que mede esta thread também
+            yield
+            return
+        self._active.stage = name
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active.stage = None
+            if not PER_THREAD_PROFILES:
+                with self._lock:
+                    self._running = None
+
+    def dump(self, top: int = 15) -> List[str]:
+        """Grava um arquivo .prof por etapa, imprime as funções mais caras e retorna os caminhos."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            profiles = list(self._profiles.items())
+        by_stage: Dict[str, List[cProfile.Profile]] = {}
+        for (name, _), profile in profiles:
+            by_stage.setdefault(name, []).append(profile)
+
+        paths = []
+        for name, stage_profiles in sorted(by_stage.items()):
+            stats = pstats.Stats(stage_profiles[0])
+            for profile in stage_profiles[1:]:
+                stats.add(profile)
+            path = os.path.join(self.directory, f"{name}.prof")
+            stats.dump_stats(path)
+            paths.append(path)
+
+            output = io.StringIO()
+            stats.stream = output
+            stats.sort_stats("cumulative").print_stats(top)
+            print(f"\n=== Perfil da etapa {name} ({path}) ===")
+            print(output.getvalue())
+        return paths
+
+
+profiler = StageProfiler()
+
+
+def profile_stage(name: str):
+    """Atalho para `profiler.stage(name)`."""
+    return profiler.stage(name)
@@ -0,0 +1,182 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.rss.feed_parser import News
+from utils.state.state import state_path
+
+# Arquivo SQLite da fila de envio
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", state_path("outbox.sqlite3"))
+# Número máximo de tentativas antes de marcar a notícia como falha definitiva
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# Espera base (em segundos) do backoff exponencial entre tentativas
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "60"))
+# Quantas mudanças de estado são acumuladas antes de gravar no disco
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class Outbox:
+    """
+    Fila de envio durável em SQLite (modo WAL).
+
+    As notícias entram como `pending` antes de qualquer envio e só saem da fila
+    quando o envio é confirmado (`sent`). Falhas incrementam o número de tentativas
+    e reagendam a notícia com backoff exponencial; após `max_attempts` ela fica
+    como `failed`. As mudanças de estado são acumuladas e gravadas em lote.
+
+    Com vários destinos, cada notícia guarda em `delivered_to` os destinos que já
+    receberam a mensagem; as novas tentativas vão só para os que faltam.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 backoff_seconds: float = OUTBOX_BACKOFF_SECONDS, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.batch_size = max(1, batch_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # (url, sucesso, erro, destinos entregues)
+        self._updates: List[Tuple[str, bool, Optional[str], List[str]]] = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                url TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                published_time TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                delivered_to TEXT NOT NULL DEFAULT '[]'
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "delivered_to" not in columns:
+            # Filas criadas antes do suporte a vários destinos
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN delivered_to TEXT NOT NULL DEFAULT '[]'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        self._conn.commit()
+
+    def enqueue_many(self, news_list: List[News]) -> int:
+        """Adiciona as notícias como pendentes. URLs já presentes na fila são ignoradas."""
+        now = time.time()
+        rows = [
+            (news.url, json.dumps(asdict(news), ensure_ascii=False), news.published_time, PENDING, now, now, now)
+            for news in news_list
+        ]
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO outbox (url, payload, published_time, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def due(self, limit: Optional[int] = None) -> List[News]:
+        """Retorna as notícias pendentes prontas para (re)envio, por ordem de publicação."""
+        query = "SELECT payload FROM outbox WHERE status = ? AND next_attempt_at <= ? ORDER BY published_time"
+        params: tuple = (PENDING, time.time())
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [News(**json.loads(payload)) for (payload,) in rows]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (PENDING,)).fetchone()[0]
+
+    def delivered_to(self, urls: Iterable[str]) -> Dict[str, Set[str]]:
+        """Retorna, para cada URL, os destinos que já receberam a notícia."""
+        urls = list(urls)
+        result: Dict[str, Set[str]] = {url: set() for url in urls}
+        with self._lock:
+            # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT url, delivered_to FROM outbox WHERE url IN ({placeholders})", chunk
+                ).fetchall()
+                for url, delivered in rows:
+                    result[url] = set(json.loads(delivered or "[]"))
+        return result
+
+    def mark_sent(self, url: str):
+        self._record(url, True, None, ())
+
+    def mark_failed(self, url: str, error: str, delivered: Iterable[str] = ()):
+        """
+        Registra uma tentativa com falha. `delivered` são os destinos que receberam
+        a mensagem nesta tentativa; eles não recebem de novo nas próximas.
+        """
+        self._record(url, False, error, delivered)
+
+    def _record(self, url: str, success: bool, error: Optional[str], delivered: Iterable[str]):
+        with self._lock:
+            self._updates.append((url, success, error, list(delivered)))
+            should_flush = len(self._updates) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Grava em uma única transação todas as mudanças de estado acumuladas."""
+        with self._lock:
+            updates, self._updates = self._updates, []
+            if not updates:
+                return
+            now = time.time()
+            sent = [(SENT, now, url) for url, success, _, _ in updates if success]
+            failed = [(url, error, delivered) for url, success, error, delivered in updates if not success]
+            with self._conn:
+                if sent:
+                    self._conn.executemany(
+                        "UPDATE outbox SET status = ?, updated_at = ?, last_error = NULL WHERE url = ?", sent
+                    )
+                for url, error, delivered in failed:
+                    row = self._conn.execute(
+                        "SELECT attempts, delivered_to FROM outbox WHERE url = ?", (url,)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    delivered_to = json.dumps(sorted(set(json.loads(row[1] or "[]")) | set(delivered)))
+                    attempts = row[0] + 1
+                    status = FAILED if attempts >= self.max_attempts else PENDING
+                    # Backoff exponencial com jitter para não reenviar tudo ao mesmo tempo
+                    delay = self.backoff_seconds * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?, "
+                        "delivered_to = ? WHERE url = ?",
+                        (status, attempts, now + delay, error, now, delivered_to, url)
+                    )
+
+    def purge_sent(self, older_than_days: float = 7):
+        """Remove da fila as notícias enviadas há mais de `older_than_days` dias."""
+        cutoff = time.time() - older_than_days * 24 * 3600
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM outbox WHERE status = ? AND updated_at < ?", (SENT, cutoff))
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
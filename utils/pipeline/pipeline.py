@@ -0,0 +1,259 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional, Tuple
+
+from utils.rss.feed_parser import News
+from utils.scraper.scraper import ImageScraper, IMAGE_MAX_WORKERS
+from utils.scraper.image_normalizer import ImageNormalizer
+from utils.wpp.wpp import WhatsAppSender
+from utils.outbox.outbox import Outbox
+from utils.metrics.profiling import profile_stage
+
+# Quantidade máxima de imagens baixadas à frente do envio
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+# Acima deste número de notícias pendentes, o envio passa a ser em resumos (0 = desativado)
+DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", "15"))
+# Número de manchetes por mensagem de resumo
+DIGEST_SIZE = int(os.getenv("DIGEST_SIZE", "8"))
+# Notícias testadas até encontrar uma imagem para o resumo
+DIGEST_IMAGE_ATTEMPTS = 3
+
+_DONE = object()
+
+
+@profile_stage("images")
+def _prepare_image(news: News, scraper: ImageScraper,
+                   normalizer: Optional[ImageNormalizer]) -> Optional[Tuple[bytes, str]]:
+    """Baixa a imagem da notícia e, se houver normalizador, reduz e reencoda."""
+    image = scraper.get_image_bytes(news)
+    if image and normalizer is not None:
+        image = normalizer.normalize(news, image)
+    return image
+
+
+def deliver_news(news_list: List[News], scraper: ImageScraper, wpp: WhatsAppSender,
+                 queue_size: int = PIPELINE_QUEUE_SIZE,
+                 max_workers: int = IMAGE_MAX_WORKERS,
+                 outbox: Optional[Outbox] = None,
+                 normalizer: Optional[ImageNormalizer] = None,
+                 stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Envia as notícias para o WhatsApp em um pipeline produtor/consumidor.
+
+    O produtor agenda o download das imagens em um pool de threads e coloca os
+    resultados pendentes em uma fila limitada; o consumidor agenda o envio das
+    mensagens na ordem original assim que cada imagem fica pronta, sem esperar o
+    envio anterior terminar: até `wpp.max_in_flight` notícias ficam em andamento
+    e o resultado de cada uma é registrado quando os seus envios terminam. O
+    ritmo de envio fica a cargo do rate limiter do WhatsAppSender, e a ordem das
+    mensagens em cada destino é mantida pelo cliente do gateway
+    (WHATSAPP_PRESERVE_ORDER).
+
+    Cada notícia é enviada a todos os destinos do WhatsAppSender em paralelo,
+    reaproveitando a mesma imagem; a notícia só conta como enviada quando todos
+    os destinos recebem a mensagem.
+
+    Com um ImageNormalizer, as imagens são reduzidas e reencodadas antes do envio.
+    Com um Outbox, o resultado de cada notícia é registrado na fila durável
+    (enviada ou falha com nova tentativa agendada) e as novas tentativas vão só
+    para os destinos que ainda não receberam a notícia.
+
+    Se `stop_event` for acionado (SIGTERM), nenhuma notícia nova é enviada; os
+    envios em andamento são concluídos e registrados, e as notícias que ficaram
+    para trás continuam pendentes no Outbox, que é gravado antes de sair.
+
+    Returns:
+        Contadores {"sent": ..., "failed": ..., "no_image": ...}
+    """
+    stats = {"sent": 0, "failed": 0, "no_image": 0}
+    if not news_list:
+        return stats
+
+    pending = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+    workers = max(1, min(max_workers, len(news_list)))
+    delivered = outbox.delivered_to(news.url for news in news_list) if outbox else {}
+    # Notícias com envio agendado e ainda não registrado, na ordem de envio
+    in_flight: Deque[Tuple[News, Dict[str, Future]]] = deque()
+    max_in_flight = max(1, wpp.max_in_flight)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def produce():
+            try:
+                for news in news_list:
+                    if stop.is_set():
+                        break
+                    # put bloqueia quando a fila está cheia, limitando os downloads adiantados
+                    pending.put((news, executor.submit(_prepare_image, news, scraper, normalizer)))
+            finally:
+                pending.put(_DONE)
+
+        producer = threading.Thread(target=produce, name="image-producer", daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    break
+                news, future = item
+                if stop_event is not None and stop_event.is_set():
+                    print("Encerramento solicitado, interrompendo o envio")
+                    future.cancel()
+                    break
+                print(f"\nProcessando notícia: {news.title}")
+
+                try:
+                    image = future.result()
+                except Exception as e:
+                    print(f"Erro ao baixar a imagem para {news.image_url}: {str(e)}")
+                    image = None
+                if not image:
+                    print(f"Erro ao baixar a imagem para {news.image_url}")
+                    stats["no_image"] += 1
+                    if outbox:
+                        outbox.mark_failed(news.url, "imagem indisponível")
+                    continue
+                image_bytes, image_format = image
+
+                # Enviar mensagem só aos destinos que faltam (o WhatsAppSender aplica o limite de taxa)
+                already_delivered = delivered.get(news.url, set())
+                destinations = [d for d in wpp.destinations if d not in already_delivered]
+                in_flight.append((news, wpp.submit_news_to_all(news, image_bytes, image_format, destinations)))
+                # Abre espaço para a próxima notícia antes de pegá-la da fila
+                _collect_sent(in_flight, max_in_flight - 1, outbox, stats)
+        finally:
+            # Os envios já agendados terminam e são registrados mesmo no encerramento
+            _collect_sent(in_flight, 0, outbox, stats)
+            if outbox:
+                outbox.flush()
+            stop.set()
+            # Esvazia a fila para liberar o produtor caso o consumidor tenha parado antes
+            while producer.is_alive() or not pending.empty():
+                try:
+                    item = pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is not _DONE:
+                    # Downloads que ainda não começaram não precisam mais ser feitos
+                    item[1].cancel()
+
+    return stats
+
+
+def _collect_sent(in_flight: Deque[Tuple[News, Dict[str, Future]]], limit: int,
+                  outbox: Optional[Outbox], stats: Dict[str, int]):
+    """
+    Registra as notícias cujos envios já terminaram, em qualquer ordem, e espera
+    enquanto houver mais de `limit` notícias em andamento.
+    """
+    while in_flight:
+        finished = [item for item in in_flight if all(future.done() for future in item[1].values())]
+        for item in finished:
+            in_flight.remove(item)
+            news, futures = item
+            failed = _record_result([news], _send_results(futures), outbox, stats)
+            if not failed:
+                print(f"Mensagem enviada com sucesso para {news.source}")
+            else:
+                print(f"Erro ao enviar noticia {news.source} link:{news.url} destinos:{', '.join(failed)}")
+        if len(in_flight) <= limit:
+            return
+        wait([future for _, futures in in_flight for future in futures.values() if not future.done()],
+             return_when=FIRST_COMPLETED)
+
+
+def _send_results(futures: Dict[str, Future]) -> Dict[str, bool]:
+    """Resultado de cada destino; um erro inesperado no envio conta como falha."""
+    results = {}
+    for destination, future in futures.items():
+        try:
+            results[destination] = future.result()
+        except Exception as e:
+            print(f"Erro ao enviar mensagem para WhatsApp ({destination}): {str(e)}")
+            results[destination] = False
+    return results
+
+
+def _record_result(news_list: List[News], results: Dict[str, bool], outbox: Optional[Outbox],
+                   stats: Dict[str, int]) -> List[str]:
+    """Contabiliza o envio das notícias e registra no Outbox. Retorna os destinos com falha."""
+    succeeded = [d for d, ok in results.items() if ok]
+    failed = [d for d, ok in results.items() if not ok]
+    stats["failed" if failed else "sent"] += len(news_list)
+    if outbox:
+        for news in news_list:
+            if failed:
+                outbox.mark_failed(news.url, f"erro no envio para {', '.join(failed)}", succeeded)
+            else:
+                outbox.mark_sent(news.url)
+    return failed
+
+
+def deliver_digest(news_list: List[News], scraper: ImageScraper, wpp: WhatsAppSender,
+                   digest_size: int = DIGEST_SIZE,
+                   outbox: Optional[Outbox] = None,
+                   normalizer: Optional[ImageNormalizer] = None,
+                   stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Envia um acúmulo de notícias em resumos: cada mensagem traz até `digest_size`
+    manchetes e uma única imagem, da notícia mais recente do grupo que tiver imagem.
+
+    Notícias que faltam para destinos diferentes (após envios parciais) ficam em
+    resumos separados, para que nenhum destino receba a mesma notícia duas vezes.
+
+    Returns:
+        Contadores {"sent": ..., "failed": ..., "no_image": ..., "digests": ...}, por notícia
+    """
+    stats = {"sent": 0, "failed": 0, "no_image": 0, "digests": 0}
+    if not news_list:
+        return stats
+
+    delivered = outbox.delivered_to(news.url for news in news_list) if outbox else {}
+    groups: Dict[frozenset, List[News]] = {}
+    for news in news_list:
+        remaining = frozenset(d for d in wpp.destinations if d not in delivered.get(news.url, set()))
+        groups.setdefault(remaining, []).append(news)
+
+    digest_size = max(1, digest_size)
+    try:
+        for remaining, group in groups.items():
+            destinations = [d for d in wpp.destinations if d in remaining]
+            for start in range(0, len(group), digest_size):
+                if stop_event is not None and stop_event.is_set():
+                    print("Encerramento solicitado, interrompendo o envio")
+                    return stats
+                digest = group[start:start + digest_size]
+                print(f"\nEnviando resumo com {len(digest)} notícias")
+
+                image = None
+                for news in list(reversed(digest))[:DIGEST_IMAGE_ATTEMPTS]:
+                    try:
+                        image = _prepare_image(news, scraper, normalizer)
+                    except Exception as e:
+                        print(f"Erro ao baixar a imagem para {news.image_url}: {str(e)}")
+                    if image:
+                        break
+                if not image:
+                    print("Nenhuma imagem disponível para o resumo")
+                    stats["no_image"] += len(digest)
+                    if outbox:
+                        for news in digest:
+                            outbox.mark_failed(news.url, "imagem indisponível")
+                    continue
+
+                results = wpp.send_digest_to_all(digest, image[0], image[1], destinations)
+                stats["digests"] += 1
+                failed = _record_result(digest, results, outbox, stats)
+                if failed:
+                    print(f"Erro ao enviar resumo para {', '.join(failed)}")
+                else:
+                    print("Resumo enviado com sucesso")
+    finally:
+        if outbox:
+            outbox.flush()
+
+    return stats
@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils.state.state import load_json, save_json, state_path
+
+# Caminho padrão do arquivo de cache dos feeds
+FEED_CACHE_PATH = os.getenv("FEED_CACHE_PATH", state_path("feeds.json"))
+
+
+class FeedCache:
+    """
+    Cache persistente dos feeds RSS indexado pela URL do feed.
+
+    Guarda os validadores HTTP (ETag / Last-Modified) para requisições
+    condicionais e as últimas notícias processadas, que são reaproveitadas
+    quando o servidor responde 304 ou quando o download falha.
+    """
+
+    def __init__(self, path: str = FEED_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Carrega o cache do disco. Um arquivo ausente ou corrompido resulta em cache vazio."""
+        return load_json(self.path, "o cache de feeds", {})
+
+    def save(self) -> None:
+        """Grava o cache no disco de forma atômica."""
+        with self._lock:
+            save_json(self.path, self._entries)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Retorna os cabeçalhos If-None-Match / If-Modified-Since para a URL."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get_news(self, url: str) -> Optional[List[Dict]]:
+        """Retorna as notícias (como dicionários) guardadas para a URL, ou None se não houver cache."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None:
+            return None
+        return list(entry.get("news", []))
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str],
+              news: List[Dict]) -> None:
+        """Atualiza o cache da URL com os novos validadores e notícias."""
+        with self._lock:
+            self._entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time(),
+                "news": news,
+            }
+
+    def update_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Atualiza apenas os validadores da URL, mantendo as notícias já guardadas."""
+        with self._lock:
+            entry = self._entries.setdefault(url, {"news": []})
+            entry["etag"] = etag
+            entry["last_modified"] = last_modified
+            entry["fetched_at"] = time.time()
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from utils.state.state import load_json, save_json, state_path
+
+# Arquivo com as estatísticas de saúde dos feeds
+FEED_HEALTH_PATH = os.getenv("FEED_HEALTH_PATH", state_path("feed_health.json"))
+# Falhas consecutivas até abrir o circuito do feed
+FEED_FAILURE_THRESHOLD = int(os.getenv("FEED_FAILURE_THRESHOLD", "3"))
+# Espera inicial e máxima (em segundos) antes de testar de novo um feed com circuito aberto
+FEED_BACKOFF_SECONDS = float(os.getenv("FEED_BACKOFF_SECONDS", "60"))
+FEED_MAX_BACKOFF_SECONDS = float(os.getenv("FEED_MAX_BACKOFF_SECONDS", "3600"))
+# Limites do timeout adaptativo (em segundos)
+FEED_MIN_TIMEOUT = float(os.getenv("FEED_MIN_TIMEOUT", "3"))
+# Número de latências guardadas por feed para calcular os percentis
+LATENCY_SAMPLES = 50
+# Amostras necessárias antes de adaptar o timeout
+MIN_SAMPLES = 5
+# O timeout adaptativo é o p95 da latência multiplicado por este fator
+TIMEOUT_MULTIPLIER = 3.0
+
+
+class CircuitOpenError(requests.RequestException):
+    """O circuito do feed está aberto e a requisição não foi feita."""
+
+
+class FeedHealth:
+    """
+    Circuit breaker e estatísticas de latência por feed, persistidos em JSON.
+
+    Após `failure_threshold` falhas seguidas o circuito do feed abre e ele deixa
+    de ser consultado até o fim do backoff exponencial; a próxima requisição
+    funciona como teste (half-open). O timeout de cada feed acompanha o p95
+    da latência observada, dentro dos limites configurados.
+    """
+
+    def __init__(self, path: str = FEED_HEALTH_PATH, failure_threshold: int = FEED_FAILURE_THRESHOLD,
+                 backoff_seconds: float = FEED_BACKOFF_SECONDS,
+                 max_backoff_seconds: float = FEED_MAX_BACKOFF_SECONDS,
+                 min_timeout: float = FEED_MIN_TIMEOUT):
+        self.path = path
+        self.failure_threshold = max(1, failure_threshold)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.min_timeout = min_timeout
+        self._lock = threading.Lock()
+        self._feeds: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        return load_json(self.path, "a saúde dos feeds", {})
+
+    def save(self):
+        with self._lock:
+            save_json(self.path, self._feeds)
+
+    def _stats(self, url: str) -> Dict:
+        return self._feeds.setdefault(url, {
+            "failures": 0, "open_until": 0.0, "latencies": [],
+            "total_successes": 0, "total_failures": 0, "last_error": None,
+        })
+
+    def allow(self, url: str) -> bool:
+        """Retorna False enquanto o circuito do feed estiver aberto."""
+        with self._lock:
+            stats = self._feeds.get(url)
+            return not stats or stats["open_until"] <= time.time()
+
+    def retry_in(self, url: str) -> float:
+        """Segundos até o próximo teste de um feed com circuito aberto."""
+        with self._lock:
+            stats = self._feeds.get(url)
+            return max(0.0, stats["open_until"] - time.time()) if stats else 0.0
+
+    def timeout_for(self, url: str, default: float) -> float:
+        """Timeout adaptativo: p95 da latência × fator, entre min_timeout e `default`."""
+        with self._lock:
+            stats = self._feeds.get(url)
+            latencies = sorted(stats["latencies"]) if stats else []
+        if len(latencies) < MIN_SAMPLES:
+            return default
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return max(self.min_timeout, min(default, p95 * TIMEOUT_MULTIPLIER))
+
+    def record_success(self, url: str, latency: float):
+        with self._lock:
+            stats = self._stats(url)
+            stats["failures"] = 0
+            stats["open_until"] = 0.0
+            stats["total_successes"] += 1
+            stats["latencies"] = (stats["latencies"] + [round(latency, 4)])[-LATENCY_SAMPLES:]
+
+    def record_failure(self, url: str, error: str) -> Optional[float]:
+        """
+        Registra uma falha. Se o circuito abrir, retorna quantos segundos o feed
+        ficará sem ser consultado.
+        """
+        with self._lock:
+            stats = self._stats(url)
+            stats["failures"] += 1
+            stats["total_failures"] += 1
+            stats["last_error"] = error
+            if stats["failures"] < self.failure_threshold:
+                return None
+            exponent = stats["failures"] - self.failure_threshold
+            backoff = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** exponent))
+            stats["open_until"] = time.time() + backoff
+            return backoff
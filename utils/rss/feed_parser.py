@@ -1,10 +1,34 @@
-import feedparser
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+import requests
+from typing import List, Dict, Optional, Tuple, Iterator, TYPE_CHECKING
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 import html
 from datetime import datetime, timedelta
 import time
+import calendar
+import os
+import socket
+import threading
+from utils.rss.feed_cache import FeedCache
+from utils.rss.feed_health import FeedHealth, CircuitOpenError
+from utils.rss.feed_scheduler import FeedScheduler
+from utils.capture.archive import CaptureArchive
+from utils.metrics.profiling import profile_stage
+from utils.metrics.metrics import (
+    span, FEED_FETCH_SECONDS, FEED_FETCH_TOTAL, FEED_PARSE_SECONDS, FEED_ENTRIES_TOTAL
+)
+
+if TYPE_CHECKING:
+    # O feedparser é importado sob demanda para não atrasar a inicialização
+    import feedparser
+
+# Tempo máximo (em segundos) para baixar cada feed, do início da requisição ao fim do conteúdo
+FEED_TIMEOUT = float(os.getenv("FEED_TIMEOUT", "15"))
+# Tamanho das partes em que o conteúdo do feed é lido
+FEED_CHUNK_SIZE = 64 * 1024
+# Número máximo de feeds baixados simultaneamente
+FEED_MAX_WORKERS = int(os.getenv("FEED_MAX_WORKERS", "16"))
 
 DEFAULT_IMAGES = {
     'Cointelegraph': {
@@ -32,9 +56,30 @@ class News:
     image_format: Optional[str] = None # Formato da imagem é opcional
 
 class FeedParser:
-    def __init__(self, rss_feeds: List[Dict[str, str]]):
+    def __init__(self, rss_feeds: List[Dict[str, str]], timeout: float = FEED_TIMEOUT,
+                 max_workers: int = FEED_MAX_WORKERS, cache: Optional[FeedCache] = None,
+                 session: Optional[requests.Session] = None, lazy: bool = False,
+                 health: Optional[FeedHealth] = None, scheduler: Optional[FeedScheduler] = None,
+                 archive: Optional[CaptureArchive] = None):
         self.rss_feeds = rss_feeds
-        self.news = self._parse_feeds()
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache
+        self.health = health
+        self.scheduler = scheduler
+        # Grava o XML baixado ou, no modo replay, lê os feeds do arquivo em vez da rede
+        self.archive = archive
+        # Uma sessão pode ser compartilhada entre execuções para reaproveitar conexões
+        self.session = session or requests.Session()
+        # No modo lazy os feeds só são processados por completo se `news` for acessado;
+        # use iter_new_news para processar apenas as entradas novas
+        self._news: Optional[List[News]] = None if lazy else self._parse_feeds()
+
+    @property
+    def news(self) -> List[News]:
+        if self._news is None:
+            self._news = self._parse_feeds()
+        return self._news
 
     def clean_html(self, html_text: str) -> str:
         """Remove tags HTML, decodifica entidades HTML e retorna apenas o texto."""
@@ -64,25 +109,214 @@ class FeedParser:
         # Formatar no formato desejado
         return local_time.strftime('%Y-%m-%d %H:%M')
 
-    def _parse_feeds(self) -> List[News]:
-        all_news = []
+    def _get(self, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+        """
+        GET com prazo total de `timeout` segundos.
+
+        O timeout do requests vale para a conexão e para cada leitura, então um
+        servidor que manda poucos bytes por vez nunca o atinge. Aqui o conteúdo é
+        lido em partes e, se o prazo acabar, a conexão é derrubada, o que também
+        interrompe uma leitura que está bloqueada esperando a próxima parte.
+
+        Raises:
+            requests.Timeout: se o conteúdo não chegar por completo dentro do prazo
+        """
+        deadline = time.monotonic() + timeout
+        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+        sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+        lock = threading.Lock()
+        finished = []
+
+        def abort():
+            with lock:
+                if finished or sock is None:
+                    return
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()), abort)
+        timer.daemon = True
+        timer.start()
+        chunks = []
+        try:
+            for chunk in response.iter_content(FEED_CHUNK_SIZE):
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    break
+        except requests.RequestException:
+            if time.monotonic() < deadline:
+                raise
+        finally:
+            with lock:
+                finished.append(True)
+            timer.cancel()
+            response.close()
+        if time.monotonic() > deadline:
+            raise requests.Timeout(f"o feed não terminou de baixar em {timeout:.0f}s")
+        # Mesma forma como o requests guarda o conteúdo lido, para que `response.content` funcione
+        response._content = b"".join(chunks)
+        return response
+
+    def _download_feed(self, source: str, url: str) -> Optional[requests.Response]:
+        """
+        Faz a requisição do feed, condicional quando há cache configurado.
+        
+        Com FeedHealth configurado, feeds com circuito aberto não são consultados
+        e o timeout acompanha a latência observada de cada feed.
         
-        for feed_dict in self.rss_feeds:
-            source = list(feed_dict.keys())[0]
-            url = feed_dict[source]
+        Com um CaptureArchive gravando, a requisição nunca é condicional, para que
+        o XML completo fique no arquivo; no modo replay o feed vem do arquivo.
+        
+        Returns:
+            A resposta HTTP, ou None se o servidor respondeu 304 e o cache tem o conteúdo
+        
+        Raises:
+            requests.RequestException: em caso de erro de rede ou status HTTP de erro
+            CircuitOpenError: se o circuito do feed estiver aberto
+        """
+        if self.archive is not None and self.archive.replaying:
+            return self.archive.feed_response(url)
             
-            feed = feedparser.parse(url)
+        if self.health and not self.health.allow(url):
+            FEED_FETCH_TOTAL.inc(source=source, result="circuit_open")
+            raise CircuitOpenError(
+                f"circuito aberto, nova tentativa em {self.health.retry_in(url):.0f}s"
+            )
             
-            for entry in feed.entries:
-                news = self._create_news_from_entry(entry, source)
-                
-                all_news.append(news)
+        timeout = self.health.timeout_for(url, self.timeout) if self.health else self.timeout
+        started_at = time.perf_counter()
+        
+        with span("feed.fetch", FEED_FETCH_SECONDS, source=source, url=url,
+                  timeout=round(timeout, 2)) as current:
+            try:
+                recording = self.archive is not None and self.archive.recording
+                headers = self.cache.conditional_headers(url) if self.cache and not recording else {}
+                response = self._get(url, headers, timeout)
+                if response.status_code == 304 and self.cache:
+                    if self.cache.get_news(url) is not None:
+                        current.set(result="not_modified")
+                        FEED_FETCH_TOTAL.inc(source=source, result="not_modified")
+                        if self.health:
+                            self.health.record_success(url, time.perf_counter() - started_at)
+                        return None
+                    # Cache sem notícias: refaz a requisição sem validadores
+                    response = self._get(url, {}, timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                current.set(result="error")
+                FEED_FETCH_TOTAL.inc(source=source, result="error")
+                if self.health:
+                    backoff = self.health.record_failure(url, str(e))
+                    if backoff:
+                        print(f"Circuito do feed {source} aberto por {backoff:.0f}s")
+                raise
+            current.set(result="ok", bytes=len(response.content))
+            FEED_FETCH_TOTAL.inc(source=source, result="ok")
+            if recording:
+                self.archive.record_feed(source, url, response)
+            if self.health:
+                self.health.record_success(url, time.perf_counter() - started_at)
+            return response
+
+    def _save_state(self):
+        """Grava o cache, as estatísticas de saúde e a agenda dos feeds."""
+        stores = (("cache de feeds", self.cache), ("saúde dos feeds", self.health), ("agenda dos feeds", self.scheduler))
+        for name, store in stores:
+            if store is None:
+                continue
+            try:
+                store.save()
+            except OSError as e:
+                print(f"Erro ao salvar {name}: {str(e)}")
+
+    def _parse_content(self, source: str, content: bytes) -> "feedparser.FeedParserDict":
+        """Faz o parsing do XML do feed, registrando o tempo gasto."""
+        import feedparser
+        
+        with span("feed.parse", FEED_PARSE_SECONDS, source=source) as current:
+            feed = feedparser.parse(content)
+            current.set(entries=len(feed.entries))
+        FEED_ENTRIES_TOTAL.inc(len(feed.entries), source=source)
+        return feed
+
+    def _observe(self, url: str, feed: Optional["feedparser.FeedParserDict"]):
+        """Informa ao agendador as datas de publicação do feed (None se não houve conteúdo novo)."""
+        if self.scheduler is None:
+            return
+        published = None
+        if feed is not None:
+            published = [calendar.timegm(entry.published_parsed) for entry in feed.entries
+                         if entry.get('published_parsed')]
+        self.scheduler.observe(url, published)
+
+    @profile_stage("feeds")
+    def _fetch_feed(self, feed_dict: Dict[str, str]) -> Tuple[str, List[News]]:
+        """
+        Baixa e processa um único feed respeitando o timeout configurado.
+        
+        Com cache configurado, envia uma requisição condicional: em caso de 304
+        as notícias do cache são reaproveitadas sem novo parsing, e em caso de
+        erro o conteúdo antigo do cache é usado como fallback.
+        Sem cache, um feed com erro é ignorado e retorna uma lista vazia.
+        """
+        source = list(feed_dict.keys())[0]
+        url = feed_dict[source]
+        
+        try:
+            response = self._download_feed(source, url)
+        except requests.RequestException as e:
+            print(f"Erro ao baixar o feed {source}: {str(e)}")
+            self._observe(url, None)
+            cached = self.cache.get_news(url) if self.cache else None
+            if cached:
+                print(f"Usando conteúdo em cache para o feed {source}")
+                return source, [News(**item) for item in cached]
+            return source, []
+            
+        if response is None:
+            self._observe(url, None)
+            return source, [News(**item) for item in self.cache.get_news(url)]
+            
+        feed = self._parse_content(source, response.content)
+        self._observe(url, feed)
+        
+        news_list = []
+        for entry in feed.entries:
+            try:
+                news_list.append(self._create_news_from_entry(entry, source))
+            except (AttributeError, KeyError, TypeError) as e:
+                print(f"Entrada inválida no feed {source}: {str(e)}")
+        
+        if self.cache:
+            self.cache.store(
+                url,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                [asdict(news) for news in news_list]
+            )
+        return source, news_list
+
+    def _parse_feeds(self) -> List[News]:
+        all_news = []
+        
+        if not self.rss_feeds:
+            return all_news
+        
+        # Baixa os feeds em paralelo, cada um com seu próprio timeout
+        workers = max(1, min(self.max_workers, len(self.rss_feeds)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _, news_list in executor.map(self._fetch_feed, self.rss_feeds):
+                all_news.extend(news_list)
+        
+        self._save_state()
         
         # Ordena as notícias por data de publicação (mais recentes primeiro)
         all_news.sort(key=lambda x: x.published_time)
         return all_news
 
-    def _create_news_from_entry(self, entry: feedparser.FeedParserDict, source: str) -> News:
+    def _create_news_from_entry(self, entry: "feedparser.FeedParserDict", source: str) -> News:
         """
         Cria um objeto News a partir de uma entrada do feed RSS.
         """
@@ -145,6 +379,79 @@ class FeedParser:
         filtered_news.sort(key=lambda x: x.published_time)
         return filtered_news
 
+    @profile_stage("feeds")
+    def _download_for_streaming(self, feed_dict: Dict[str, str]) -> Tuple[str, str, Optional[requests.Response]]:
+        """
+        Baixa um feed para iter_new_news. Feeds não modificados (304) ou com erro
+        retornam None, pois o conteúdo em cache já foi processado em ciclos anteriores.
+        """
+        source = list(feed_dict.keys())[0]
+        url = feed_dict[source]
+        try:
+            return source, url, self._download_feed(source, url)
+        except requests.RequestException as e:
+            print(f"Erro ao baixar o feed {source}: {str(e)}")
+            return source, url, None
+
+    def iter_new_news(self, seen_index=None) -> Iterator[News]:
+        """
+        Gera, sob demanda, apenas as notícias novas de cada feed.
+        
+        As entradas já presentes no índice de deduplicação são descartadas antes da
+        limpeza do HTML e da criação do objeto News. Como todas as entradas de um
+        feed entram no índice no ciclo em que aparecem, em feeds ordenados por data
+        a leitura para na primeira entrada já vista: as seguintes são mais antigas
+        e já foram processadas. Os feeds são baixados em paralelo e processados
+        conforme ficam prontos.
+        
+        Args:
+            seen_index: Objeto com suporte a `url in seen_index` (ex: DedupeIndex)
+        """
+        if not self.rss_feeds:
+            return
+            
+        yielded_urls = set()
+        workers = max(1, min(self.max_workers, len(self.rss_feeds)))
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._download_for_streaming, feed_dict) for feed_dict in self.rss_feeds]
+            for future in as_completed(futures):
+                source, url, response = future.result()
+                if response is None:
+                    self._observe(url, None)
+                    continue
+                    
+                feed = self._parse_content(source, response.content)
+                self._observe(url, feed)
+                if self.cache:
+                    self.cache.update_validators(
+                        url, response.headers.get("ETag"), response.headers.get("Last-Modified")
+                    )
+                    
+                times = [entry.get('published_parsed') for entry in feed.entries]
+                # O corte antecipado só é seguro se o feed estiver do mais novo para o mais antigo
+                date_ordered = all(times) and all(a >= b for a, b in zip(times, times[1:]))
+                
+                for entry, published_parsed in zip(feed.entries, times):
+                    entry_url = entry.get('link')
+                    if not entry_url or not published_parsed or entry_url in yielded_urls:
+                        continue
+                        
+                    if seen_index is not None and entry_url in seen_index:
+                        if date_ordered:
+                            break
+                        continue
+                        
+                    try:
+                        news = self._create_news_from_entry(entry, source)
+                    except (AttributeError, KeyError, TypeError) as e:
+                        print(f"Entrada inválida no feed {source}: {str(e)}")
+                        continue
+                    yielded_urls.add(entry_url)
+                    yield news
+                    
+        self._save_state()
+
 
 rss_feeds = [
     {'Cointelegraph':'https://br.cointelegraph.com/rss'},
@@ -0,0 +1,119 @@
+import heapq
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.state.state import load_json, save_json, state_path
+
+# Arquivo com o intervalo aprendido e o próximo horário de consulta de cada feed
+FEED_SCHEDULE_PATH = os.getenv("FEED_SCHEDULE_PATH", state_path("feed_schedule.json"))
+# Limites (em segundos) do intervalo entre consultas de um mesmo feed
+FEED_MIN_INTERVAL = float(os.getenv("FEED_MIN_INTERVAL", "60"))
+FEED_MAX_INTERVAL = float(os.getenv("FEED_MAX_INTERVAL", "3600"))
+# Agenda cada feed conforme o ritmo de publicação (1 = sim, 0 = todos a cada ciclo)
+FEED_ADAPTIVE_POLLING = os.getenv("FEED_ADAPTIVE_POLLING", "1") == "1"
+# Publicações recentes usadas para estimar o ritmo do feed
+RATE_SAMPLES = 10
+# Consultas por intervalo médio entre publicações
+POLLS_PER_POST = 2.0
+# Peso da nova estimativa na média móvel do intervalo
+SMOOTHING = 0.5
+# Fator de aumento do intervalo quando o feed não traz conteúdo novo
+IDLE_BACKOFF = 1.5
+
+
+class FeedScheduler:
+    """
+    Agenda a consulta de cada feed em uma fila de prioridade (min-heap) ordenada
+    pelo próximo horário de consulta.
+
+    O intervalo de cada feed é aprendido a partir das datas de publicação das
+    entradas: feeds movimentados são consultados com mais frequência e feeds
+    parados com menos, sempre entre `min_interval` e `max_interval`. Um feed sem
+    conteúdo novo (304 ou erro) tem o intervalo aumentado aos poucos.
+    """
+
+    def __init__(self, path: str = FEED_SCHEDULE_PATH, default_interval: float = 300,
+                 min_interval: float = FEED_MIN_INTERVAL, max_interval: float = FEED_MAX_INTERVAL):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.default_interval = self._clamp(default_interval)
+        self._lock = threading.Lock()
+        self._feeds: Dict[str, Dict[str, float]] = self._load()
+        # (próxima consulta, url); entradas desatualizadas são descartadas ao sair do heap
+        self._heap: List[Tuple[float, str]] = [(state["next_due"], url) for url, state in self._feeds.items()]
+        heapq.heapify(self._heap)
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        return load_json(self.path, "a agenda dos feeds", {})
+
+    def save(self):
+        with self._lock:
+            save_json(self.path, self._feeds)
+
+    def _clamp(self, interval: float) -> float:
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _schedule(self, url: str, interval: float, next_due: float):
+        self._feeds[url] = {"interval": interval, "next_due": next_due}
+        heapq.heappush(self._heap, (next_due, url))
+
+    def due(self, feeds: List[Dict[str, str]], now: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Retorna os feeds cuja próxima consulta já chegou. Feeds nunca vistos são
+        consultados de imediato. Cada feed retornado é reagendado provisoriamente
+        para daqui a um intervalo, caso a consulta não chegue a ser registrada.
+        """
+        now = time.time() if now is None else now
+        by_url = {next(iter(feed.values())): feed for feed in feeds}
+        due_feeds = []
+        with self._lock:
+            for url in by_url:
+                if url not in self._feeds:
+                    self._schedule(url, self.default_interval, now)
+            while self._heap and self._heap[0][0] <= now:
+                next_due, url = heapq.heappop(self._heap)
+                state = self._feeds.get(url)
+                if state is None or state["next_due"] != next_due or url not in by_url:
+                    continue
+                due_feeds.append(by_url[url])
+                self._schedule(url, state["interval"], now + state["interval"])
+        return due_feeds
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Segundos até a próxima consulta agendada (None se não houver feeds)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            while self._heap:
+                next_due, url = self._heap[0]
+                state = self._feeds.get(url)
+                if state is not None and state["next_due"] == next_due:
+                    return max(0.0, next_due - now)
+                heapq.heappop(self._heap)
+        return None
+
+    def observe(self, url: str, published: Optional[Sequence[float]], now: Optional[float] = None):
+        """
+        Atualiza o intervalo do feed após uma consulta.
+
+        Args:
+            url: URL do feed
+            published: Datas de publicação (epoch) das entradas do feed, ou None se
+                       o feed não trouxe conteúdo novo (304 ou erro)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._feeds.get(url)
+            interval = state["interval"] if state else self.default_interval
+            recent = sorted(published or [], reverse=True)[:RATE_SAMPLES]
+            if len(recent) >= 2:
+                mean_gap = (recent[0] - recent[-1]) / (len(recent) - 1)
+                # Um feed parado há mais tempo que o ritmo médio provavelmente desacelerou
+                mean_gap = max(mean_gap, now - recent[0])
+                target = mean_gap / POLLS_PER_POST
+            else:
+                target = interval * IDLE_BACKOFF
+            interval = self._clamp((1 - SMOOTHING) * interval + SMOOTHING * target)
+            self._schedule(url, interval, now + interval)
@@ -0,0 +1,115 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledDriver:
+    """Driver do pool junto com o número de vezes que já foi usado."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.broken = False
+
+
+class DriverPool:
+    """
+    Pool limitado de WebDrivers reutilizáveis.
+
+    Os drivers são criados sob demanda até o limite `size`, verificados antes de
+    cada uso e reciclados após `max_uses` usos. Um driver com erro é descartado
+    sozinho, sem afetar os demais workers.
+    """
+
+    def __init__(self, factory: Callable, size: int = 2, max_uses: int = 50):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._idle: List[_PooledDriver] = []
+        self._created = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _is_healthy(self, pooled: _PooledDriver) -> bool:
+        """Verifica se o navegador ainda responde."""
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _quit(self, pooled: _PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _acquire(self) -> _PooledDriver:
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("DriverPool já foi fechado")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    # Reserva a vaga antes de criar o driver fora do lock
+                    self._created += 1
+                    pooled = None
+                    break
+                self._condition.wait()
+
+        if pooled is not None:
+            if self._is_healthy(pooled):
+                return pooled
+            logger.warning("Driver sem resposta no health check, recriando")
+            self._quit(pooled)
+
+        try:
+            return _PooledDriver(self.factory())
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, pooled: _PooledDriver):
+        pooled.uses += 1
+        discard = pooled.broken or pooled.uses >= self.max_uses or self._closed
+        if discard:
+            if not pooled.broken and pooled.uses >= self.max_uses:
+                logger.info(f"Reciclando driver após {pooled.uses} usos")
+            self._quit(pooled)
+        with self._condition:
+            if discard:
+                self._created -= 1
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def driver(self):
+        """
+        Empresta um driver do pool. Se ocorrer uma exceção durante o uso,
+        o driver é descartado e será recriado no próximo empréstimo.
+        """
+        pooled = self._acquire()
+        try:
+            yield pooled.driver
+        except Exception:
+            pooled.broken = True
+            raise
+        finally:
+            self._release(pooled)
+
+    def close(self):
+        """Fecha todos os drivers ociosos e impede novos empréstimos."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
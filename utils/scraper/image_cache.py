@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.state.state import load_json, save_json, state_path
+
+logger = logging.getLogger(__name__)
+
+# Diretório padrão do cache de imagens
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", state_path("images"))
+# Tamanho máximo do cache em disco (em bytes)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+class ImageCache:
+    """
+    Cache de imagens em disco endereçado pelo conteúdo.
+
+    Cada imagem é gravada uma única vez em `blobs/<sha256>`, e várias URLs podem
+    apontar para o mesmo conteúdo. Quando o tamanho total passa de `max_bytes`,
+    os conteúdos usados há mais tempo são removidos (LRU).
+
+    As URLs informadas em `memory_urls` (ex: imagens padrão das fontes) também
+    ficam em memória após a primeira leitura, evitando acesso ao disco.
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 memory_urls: Optional[Iterable[str]] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.blobs_dir = os.path.join(directory, "blobs")
+        self.index_path = os.path.join(directory, "index.json")
+        self.memory_urls = set(memory_urls or [])
+        self._memory: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        index = self._load_index()
+        # url -> {"hash": ..., "format": ...}
+        self._urls: Dict[str, Dict] = index.get("urls", {})
+        # hash -> {"size": ..., "last_access": ...}
+        self._blobs: Dict[str, Dict] = index.get("blobs", {})
+
+    def _load_index(self) -> Dict:
+        return load_json(self.index_path, "o índice do cache de imagens", {})
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blobs_dir, content_hash)
+
+    def _read_blob(self, content_hash: str) -> Optional[bytes]:
+        """Lê o conteúdo do disco usando mmap."""
+        path = self._blob_path(content_hash)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except OSError:
+            return None
+
+    def _save_index_locked(self):
+        save_json(self.index_path, {"urls": self._urls, "blobs": self._blobs})
+        self._dirty = False
+
+    def save(self):
+        """Grava o índice no disco se houver alterações pendentes."""
+        with self._lock:
+            if self._dirty:
+                self._save_index_locked()
+
+    def _evict_locked(self):
+        """Remove os conteúdos menos usados até o cache caber em max_bytes."""
+        total = sum(blob["size"] for blob in self._blobs.values())
+        if total <= self.max_bytes:
+            return
+        for content_hash, blob in sorted(self._blobs.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._blob_path(content_hash))
+            except OSError:
+                pass
+            total -= blob["size"]
+            del self._blobs[content_hash]
+            for url in [url for url, entry in self._urls.items() if entry["hash"] == content_hash]:
+                del self._urls[url]
+                self._memory.pop(url, None)
+
+    def get(self, url: str) -> Optional[Tuple[bytes, str]]:
+        """Retorna (bytes, formato) da imagem da URL, ou None se não estiver em cache."""
+        with self._lock:
+            if url in self._memory:
+                return self._memory[url]
+            entry = self._urls.get(url)
+            if not entry or entry["hash"] not in self._blobs:
+                return None
+            content_hash = entry["hash"]
+            self._blobs[content_hash]["last_access"] = time.time()
+            self._dirty = True
+
+        data = self._read_blob(content_hash)
+        if data is None:
+            # Arquivo removido por fora: descarta a entrada
+            with self._lock:
+                self._urls.pop(url, None)
+                self._blobs.pop(content_hash, None)
+            return None
+
+        image = (data, entry["format"])
+        if url in self.memory_urls:
+            with self._lock:
+                self._memory[url] = image
+        return image
+
+    def put(self, url: str, data: bytes, image_format: str):
+        """Guarda a imagem da URL no cache, reaproveitando conteúdos idênticos."""
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if content_hash not in self._blobs:
+                tmp_path = f"{self._blob_path(content_hash)}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._blob_path(content_hash))
+                self._blobs[content_hash] = {"size": len(data), "last_access": time.time()}
+            else:
+                self._blobs[content_hash]["last_access"] = time.time()
+            self._urls[url] = {"hash": content_hash, "format": image_format}
+            if url in self.memory_urls:
+                self._memory[url] = (data, image_format)
+            self._evict_locked()
+            self._save_index_locked()
@@ -0,0 +1,130 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from utils.rss.feed_parser import News
+from utils.scraper.image_cache import ImageCache
+
+logger = logging.getLogger(__name__)
+
+# Largura máxima das imagens enviadas ao WhatsApp
+IMAGE_TARGET_WIDTH = int(os.getenv("IMAGE_TARGET_WIDTH", "1280"))
+# Qualidade do JPEG/WebP gerado (1-100)
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Formato de saída: jpeg ou webp
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "jpeg").lower()
+# Número de processos usados na conversão das imagens
+IMAGE_NORMALIZE_WORKERS = int(os.getenv("IMAGE_NORMALIZE_WORKERS", "2"))
+
+
+def normalize_image(data: bytes, target_width: int, quality: int, output_format: str) -> Tuple[bytes, str]:
+    """
+    Redimensiona a imagem para no máximo `target_width` de largura e reencoda no
+    formato pedido, sem metadados (EXIF, ICC, comentários).
+
+    Executada nos processos do pool, por isso é uma função de módulo. O Pillow é
+    importado aqui para carregar apenas nos processos que convertem imagens.
+    """
+    from PIL import Image, ImageOps
+    
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            # JPEG não suporta transparência: aplica fundo branco
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+
+        if image.width > target_width:
+            height = round(image.height * target_width / image.width)
+            image = image.resize((target_width, height), Image.LANCZOS)
+
+        output = io.BytesIO()
+        if output_format == "webp":
+            image.save(output, format="WEBP", quality=quality, method=4)
+        else:
+            output_format = "jpeg"
+            image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue(), output_format
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    """Usa o forkserver onde existir (Linux/macOS) e o spawn nos demais sistemas."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class ImageNormalizer:
+    """
+    Normaliza as imagens antes do envio (largura, formato, qualidade e sem metadados).
+
+    A conversão roda em um pool de processos para não disputar o GIL com as
+    threads de download e envio, e o resultado é guardado no cache de imagens.
+    """
+
+    def __init__(self, cache: Optional[ImageCache] = None, target_width: int = IMAGE_TARGET_WIDTH,
+                 quality: int = IMAGE_QUALITY, output_format: str = IMAGE_OUTPUT_FORMAT,
+                 max_workers: int = IMAGE_NORMALIZE_WORKERS):
+        self.cache = cache
+        self.target_width = target_width
+        self.quality = quality
+        self.output_format = output_format
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # O pool de processos só é criado quando a primeira imagem precisa ser convertida
+        with self._executor_lock:
+            if self._executor is None:
+                # Os processos não podem ser criados com fork: o processo principal tem
+                # threads (downloads, envio, event loop do gateway) e locks que seriam
+                # copiados em estado inconsistente para os filhos
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context())
+            return self._executor
+
+    def _cache_key(self, image_url: str) -> str:
+        return f"normalized:{self.target_width}:{self.quality}:{self.output_format}:{image_url}"
+
+    def normalize(self, news: News, image: Tuple[bytes, str]) -> Tuple[bytes, str]:
+        """
+        Retorna a imagem normalizada. Em caso de erro, ou se a versão normalizada
+        ficar maior que a original, retorna a imagem original.
+        """
+        image_bytes, image_format = image
+        key = self._cache_key(news.image_url) if news.image_url else None
+        if self.cache is not None and key:
+            cached = self.cache.get(key)
+            if cached:
+                return cached
+
+        try:
+            future = self._get_executor().submit(
+                normalize_image, image_bytes, self.target_width, self.quality, self.output_format
+            )
+            normalized = future.result()
+        except Exception as e:
+            logger.warning(f"Erro ao normalizar imagem de {news.image_url}: {str(e)}")
+            return image
+
+        if len(normalized[0]) >= len(image_bytes) and image_format in ("jpeg", "png", "webp"):
+            normalized = image
+
+        if self.cache is not None and key:
+            try:
+                self.cache.put(key, *normalized)
+            except OSError as e:
+                logger.warning(f"Erro ao gravar imagem normalizada no cache: {str(e)}")
+        return normalized
+
+    def close(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -1,10 +1,18 @@
 import base64
-from typing import Optional, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
 from utils.rss.feed_parser import News
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from utils.scraper.driver_pool import DriverPool
+from utils.scraper.image_cache import ImageCache
+from utils.capture.archive import CaptureArchive
+from utils.state.state import load_json, save_json, state_path
+from utils.metrics.metrics import (
+    span, annotate, IMAGE_FETCH_SECONDS, IMAGE_CACHE_TOTAL, IMAGE_BROWSER_FALLBACK_TOTAL
+)
 import time
 import random
 import os
@@ -18,9 +26,118 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tempo máximo (em segundos) para o download direto de uma imagem
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", "15"))
+# Arquivo onde ficam registrados os domínios que bloqueiam o download direto
+BLOCKED_DOMAINS_PATH = os.getenv("BLOCKED_DOMAINS_PATH", state_path("blocked_domains.json"))
+# Por quanto tempo (em segundos) um domínio bloqueado usa o Selenium antes de testar de novo o download direto
+BLOCKED_DOMAIN_TTL = float(os.getenv("BLOCKED_DOMAIN_TTL", "86400"))
+# Número de navegadores headless mantidos no pool
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+# Número de usos após o qual cada navegador é reciclado
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50"))
+# Número máximo de imagens baixadas simultaneamente
+IMAGE_MAX_WORKERS = int(os.getenv("IMAGE_MAX_WORKERS", "8"))
+
+# Status HTTP que indicam bloqueio (anti-bot, WAF). 429 e 503 são temporários e não bloqueiam o domínio
+BLOCKED_STATUS_CODES = {401, 403}
+
+# Assinaturas (magic bytes) dos formatos de imagem suportados
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+]
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """
+    Detecta o formato real da imagem a partir dos primeiros bytes.
+    Retorna None se os bytes não forem de uma imagem conhecida.
+    """
+    if not data:
+        return None
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif'
+    for signature, image_format in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return image_format
+    return None
+
+
+class BlockedImageError(Exception):
+    """O servidor da imagem bloqueou o download direto."""
+
+
 class ImageScraper:
-    def __init__(self):
-        self._setup_driver()
+    def __init__(self, pool_size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_MAX_USES,
+                 cache: Optional[ImageCache] = None, archive: Optional[CaptureArchive] = None):
+        self.driver_pool = DriverPool(self._setup_driver, size=pool_size, max_uses=max_uses)
+        self.session = self._setup_session()
+        self.cache = cache
+        # Grava as imagens obtidas ou, no modo replay, lê as imagens do arquivo em vez da rede
+        self.archive = archive
+        self._blocked_lock = threading.Lock()
+        self.blocked_domains = self._load_blocked_domains()
+        # Um lock por URL evita baixar a mesma imagem várias vezes em paralelo;
+        # cada entrada guarda [lock, usuários] e é removida quando ninguém mais a usa
+        self._url_locks: Dict[str, list] = {}
+        self._url_locks_lock = threading.Lock()
+
+    def _setup_session(self) -> requests.Session:
+        """
+        Cria a sessão HTTP com pool de conexões usada no download direto das imagens
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+        })
+        return session
+
+    def _load_blocked_domains(self) -> Dict[str, float]:
+        """
+        Carrega os domínios que bloquearam o download direto, com o horário do bloqueio
+        """
+        data = load_json(BLOCKED_DOMAINS_PATH, "os domínios bloqueados", {})
+        if isinstance(data, list):
+            # Formato antigo, sem horário: os bloqueios passam a contar a partir de agora
+            return {domain: time.time() for domain in data}
+        return data
+
+    def _is_domain_blocked(self, domain: str) -> bool:
+        """Retorna True enquanto o bloqueio do domínio não tiver expirado."""
+        with self._blocked_lock:
+            blocked_at = self.blocked_domains.get(domain)
+            if blocked_at is None:
+                return False
+            if time.time() - blocked_at < BLOCKED_DOMAIN_TTL:
+                return True
+            # Bloqueio expirado: a próxima imagem testa de novo o download direto
+            del self.blocked_domains[domain]
+            return False
+
+    def _mark_domain_blocked(self, domain: str):
+        """
+        Registra o domínio como bloqueado para que as próximas imagens usem o Selenium direto
+        até o bloqueio expirar (BLOCKED_DOMAIN_TTL)
+        """
+        with self._blocked_lock:
+            if domain in self.blocked_domains:
+                return
+            logger.info(f"Domínio {domain} bloqueou o download direto, usando Selenium")
+            self.blocked_domains[domain] = time.time()
+            try:
+                save_json(BLOCKED_DOMAINS_PATH, self.blocked_domains)
+            except OSError as e:
+                logger.warning(f"Erro ao salvar domínios bloqueados: {str(e)}")
         
     def _get_chromedriver_path(self):
         """
@@ -60,8 +177,14 @@ class ImageScraper:
         
     def _setup_driver(self):
         """
-        Configura o driver do Chrome em modo headless
+        Cria um novo driver do Chrome em modo headless.
+        Chamado pelo pool sempre que um navegador precisa ser (re)criado.
         """
+        # O Selenium só é importado quando um navegador é realmente necessário
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        
         logger.info("Configurando Chrome driver...")
         chrome_options = Options()
         chrome_options.add_argument('--headless')
@@ -100,67 +223,97 @@ class ImageScraper:
             logger.info(f"Usando ChromeDriver em: {chromedriver_path}")
             
             service = Service(executable_path=chromedriver_path)
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.set_page_load_timeout(30)
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+            driver.set_page_load_timeout(30)
             logger.info("Chrome driver inicializado com sucesso")
+            return driver
         except Exception as e:
             logger.error(f"Erro ao inicializar o Chrome driver: {str(e)}", exc_info=True)
             raise
             
+    def close(self):
+        """
+        Fecha todos os navegadores do pool e grava o índice do cache
+        """
+        if hasattr(self, 'driver_pool'):
+            self.driver_pool.close()
+        if getattr(self, 'cache', None) is not None:
+            self.cache.save()
+            
     def __del__(self):
         """
-        Garante que o driver seja fechado quando o objeto for destruído
+        Garante que os drivers sejam fechados quando o objeto for destruído
         """
-        if hasattr(self, 'driver'):
-            try:
-                self.driver.quit()
-            except:
-                pass
+        try:
+            self.close()
+        except:
+            pass
                 
-    def get_image_bytes(self, news: News) -> Optional[Tuple[bytes, str]]:
+    def _download_direct(self, image_url: str) -> Optional[Tuple[bytes, str]]:
         """
-        Baixa a imagem da notícia usando Selenium e retorna os bytes e o formato.
+        Baixa a imagem diretamente via HTTP, preservando os bytes originais.
         
-        Args:
-            news: Objeto News contendo a URL da imagem
-            
-        Returns:
-            Tupla contendo os bytes da imagem e o formato, ou None se falhar
+        Raises:
+            BlockedImageError: se o servidor bloquear a requisição ou responder com HTML
         """
-        if not news.image_url:
-            return None
-            
-        try:
-            # Adiciona um pequeno delay aleatório
-            time.sleep(random.uniform(1, 3))
-            
-            # Navega até a URL da imagem
-            self.driver.get(news.image_url)
-            
-            # Executa script JavaScript para pegar a imagem em base64
-            script = """
-                let img = document.querySelector('img');
-                if (!img) {
-                    img = document.body.querySelector('*');  // pega qualquer elemento se não encontrar img
-                }
-                let canvas = document.createElement('canvas');
-                canvas.width = img.naturalWidth || img.width;
-                canvas.height = img.naturalHeight || img.height;
-                let ctx = canvas.getContext('2d');
-                ctx.drawImage(img, 0, 0);
-                return canvas.toDataURL('image/jpeg');
-            """
-            
-            # Espera um pouco para a imagem carregar
-            time.sleep(2)
+        with self.session.get(image_url, timeout=IMAGE_TIMEOUT, stream=True) as response:
+            if response.status_code in BLOCKED_STATUS_CODES:
+                raise BlockedImageError(f"status {response.status_code}")
+            response.raise_for_status()
             
-            # Executa o script e obtém os dados da imagem
-            img_base64 = self.driver.execute_script(script)
+            content_type = response.headers.get('Content-Type', '')
+            if 'text/html' in content_type:
+                # Página de desafio anti-bot no lugar da imagem
+                raise BlockedImageError(f"content-type {content_type}")
+                
+            image_data = b''.join(response.iter_content(chunk_size=64 * 1024))
             
+        image_format = detect_image_format(image_data)
+        if not image_format:
+            logger.warning(f"Conteúdo baixado de {image_url} não é uma imagem reconhecida")
+            return None
+        return image_data, image_format
+
+    def _download_with_browser(self, news: News) -> Optional[Tuple[bytes, str]]:
+        """
+        Baixa a imagem da notícia usando Selenium e retorna os bytes em JPEG.
+        """
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        
+        try:
+            # Empresta um navegador do pool; em caso de erro ele é descartado e recriado
+            with self.driver_pool.driver() as driver:
+                # Adiciona um pequeno delay aleatório
+                time.sleep(random.uniform(1, 3))
+                
+                # Navega até a URL da imagem
+                driver.get(news.image_url)
+                
+                # Executa script JavaScript para pegar a imagem em base64
+                script = """
+                    let img = document.querySelector('img');
+                    if (!img) {
+                        img = document.body.querySelector('*');  // pega qualquer elemento se não encontrar img
+                    }
+                    let canvas = document.createElement('canvas');
+                    canvas.width = img.naturalWidth || img.width;
+                    canvas.height = img.naturalHeight || img.height;
+                    let ctx = canvas.getContext('2d');
+                    ctx.drawImage(img, 0, 0);
+                    return canvas.toDataURL('image/jpeg');
+                """
+                
+                # Espera um pouco para a imagem carregar
+                time.sleep(2)
+                
+                # Executa o script e obtém os dados da imagem
+                img_base64 = driver.execute_script(script)
+                
             if img_base64 and ',' in img_base64:
                 # Remove o prefixo do data URL e decodifica
                 img_data = base64.b64decode(img_base64.split(',')[1])
-                return img_data, news.image_format
+                # O canvas sempre reencoda a imagem em JPEG
+                return img_data, 'jpeg'
                 
         except TimeoutException:
             logger.warning(f"Timeout ao tentar carregar a imagem: {news.image_url}")
@@ -169,14 +322,99 @@ class ImageScraper:
         except Exception as e:
             logger.error(f"Erro inesperado ao baixar imagem da URL {news.image_url}: {str(e)}")
             
-        # Se falhar, tenta reiniciar o driver
+        return None
+
+    def get_image_bytes(self, news: News) -> Optional[Tuple[bytes, str]]:
+        """
+        Baixa a imagem da notícia e retorna os bytes e o formato real da imagem.
+        
+        Consulta primeiro o cache local. Se a imagem não estiver em cache, tenta o
+        download HTTP direto; o Selenium só é usado quando o domínio bloqueia o
+        acesso direto, e o bloqueio fica registrado por domínio.
+        
+        Args:
+            news: Objeto News contendo a URL da imagem
+            
+        Returns:
+            Tupla contendo os bytes da imagem e o formato, ou None se falhar
+        """
+        if not news.image_url:
+            return None
+            
+        with span("image.get", IMAGE_FETCH_SECONDS, url=news.image_url) as current:
+            image = self._get_image(news)
+            if "result" not in current.attributes:
+                current.set(result="ok" if image else "error")
+            if image and self.archive is not None and self.archive.recording:
+                self.archive.record_image(news.image_url, *image)
+            return image
+
+    @contextmanager
+    def _url_lock(self, url: str):
+        """Lock exclusivo da URL, descartado assim que não há mais threads usando."""
+        with self._url_locks_lock:
+            entry = self._url_locks.setdefault(url, [threading.Lock(), 0])
+            entry[1] += 1
         try:
-            self.driver.quit()
-            self._setup_driver()
-        except:
-            pass
+            with entry[0]:
+                yield
+        finally:
+            with self._url_locks_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._url_locks[url]
+
+    def _get_image(self, news: News) -> Optional[Tuple[bytes, str]]:
+        """
+        Obtém a imagem do cache ou, em caso de miss, pela rede, gravando no cache.
+        """
+        if self.cache is None:
+            return self._download(news)
             
-        return None
+        with self._url_lock(news.image_url):
+            image = self.cache.get(news.image_url)
+            if image:
+                IMAGE_CACHE_TOTAL.inc(result="hit")
+                annotate(result="cache_hit")
+                return image
+            IMAGE_CACHE_TOTAL.inc(result="miss")
+                
+            image = self._download(news)
+            if image:
+                try:
+                    self.cache.put(news.image_url, *image)
+                except OSError as e:
+                    logger.warning(f"Erro ao gravar imagem no cache: {str(e)}")
+            return image
+
+    def _download(self, news: News) -> Optional[Tuple[bytes, str]]:
+        """
+        Baixa a imagem pela rede: HTTP direto ou Selenium para domínios bloqueados.
+        No modo replay, a imagem vem do CaptureArchive.
+        """
+        if self.archive is not None and self.archive.replaying:
+            image = self.archive.image(news.image_url)
+            annotate(result="replay" if image else "error")
+            return image
+            
+        domain = urlparse(news.image_url).netloc
+        if not self._is_domain_blocked(domain):
+            try:
+                image = self._download_direct(news.image_url)
+                if image:
+                    annotate(result="direct", bytes=len(image[0]))
+                return image
+            except BlockedImageError as e:
+                logger.info(f"Download direto bloqueado para {news.image_url}: {str(e)}")
+                self._mark_domain_blocked(domain)
+            except requests.RequestException as e:
+                logger.warning(f"Erro ao baixar imagem da URL {news.image_url}: {str(e)}")
+                return None
+                
+        IMAGE_BROWSER_FALLBACK_TOTAL.inc()
+        image = self._download_with_browser(news)
+        annotate(result="browser" if image else "error")
+        return image
 
 
 if __name__ == "__main__":
@@ -192,13 +430,14 @@ if __name__ == "__main__":
     )
     
     logger.info("Baixando imagem...")
-    image_bytes, image_format = scraper.get_image_bytes(news)
+    image = scraper.get_image_bytes(news)
     
-    if image_bytes:
+    if image:
+        image_bytes, image_format = image
         # Salva a imagem em dois arquivos diferentes para teste
-        with open("test_image.jpg", "wb") as f:
+        with open(f"test_image.{image_format}", "wb") as f:
             f.write(image_bytes)
-        logger.info(f"Imagem salva como 'test_image.jpg'")
+        logger.info(f"Imagem salva como 'test_image.{image_format}'")
         logger.info(f"Formato da imagem: {image_format}")
     else:
         logger.warning("Falha ao baixar a imagem")
\ No newline at end of file
@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Diretório do estado local durável: fila de envio, índice de deduplicação, caches e saúde dos feeds.
+# Em container, monte um volume aqui para que o estado sobreviva entre execuções.
+STATE_DIR = os.getenv("STATE_DIR", ".cache")
+
+
+def state_path(*parts: str) -> str:
+    """Caminho de um arquivo ou diretório dentro de STATE_DIR."""
+    return os.path.join(STATE_DIR, *parts)
+
+
+def load_json(path: str, description: str, default: Any = None) -> Any:
+    """
+    Carrega um arquivo JSON de estado. Um caminho vazio, um arquivo ausente ou
+    corrompido resulta em `default` (o erro é registrado no log).
+
+    Args:
+        path: Caminho do arquivo
+        description: Descrição do conteúdo, usada na mensagem de erro
+        default: Valor retornado quando não há o que carregar
+    """
+    if not path or not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Erro ao carregar {description} {path}: {str(e)}")
+        return default
+
+
+def save_json(path: str, data: Any):
+    """
+    Grava o JSON de forma atômica: escreve em um arquivo temporário no mesmo
+    diretório e o renomeia por cima do original, de modo que uma interrupção no
+    meio da escrita nunca deixa um arquivo truncado. Um caminho vazio não grava nada.
+    """
+    if not path:
+        return
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
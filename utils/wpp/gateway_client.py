@@ -0,0 +1,194 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Optional
+
+from utils.metrics.metrics import span, WHATSAPP_SEND_SECONDS, WHATSAPP_SEND_TOTAL
+
+if TYPE_CHECKING:
+    # O aiohttp é importado sob demanda, só quando o primeiro envio é feito
+    import aiohttp
+
+# Tempo máximo (em segundos) de cada requisição ao gateway
+WHATSAPP_TIMEOUT = float(os.getenv("WHATSAPP_TIMEOUT", "30"))
+# Novas tentativas após erros temporários (rede, timeout, 429 e 5xx)
+WHATSAPP_MAX_RETRIES = int(os.getenv("WHATSAPP_MAX_RETRIES", "3"))
+# Espera base e máxima (em segundos) do backoff exponencial entre tentativas
+WHATSAPP_RETRY_BACKOFF = float(os.getenv("WHATSAPP_RETRY_BACKOFF", "1"))
+WHATSAPP_MAX_RETRY_DELAY = float(os.getenv("WHATSAPP_MAX_RETRY_DELAY", "60"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Status em que o gateway pede para todos os envios esperarem (Retry-After)
+THROTTLE_STATUS = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos de espera."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncGatewayClient:
+    """
+    Cliente assíncrono do endpoint /send/image do gateway do WhatsApp.
+
+    Roda um event loop próprio em uma thread de fundo, para ser usado pelo
+    pipeline síncrono: `submit` agenda o envio e devolve um Future. As conexões
+    ficam abertas entre os envios (keep-alive) e no máximo `max_in_flight`
+    requisições são feitas ao mesmo tempo.
+
+    Erros temporários são repetidos com backoff exponencial com jitter. Em 429/503
+    com Retry-After, todos os envios esperam o tempo pedido pelo gateway, de modo
+    que a vazão acompanha a capacidade dele em vez de descartar mensagens.
+
+    Com `ordered`, os envios para um mesmo destino são feitos um de cada vez, na
+    ordem em que foram agendados (incluindo as novas tentativas), para que o canal
+    receba as notícias na ordem de publicação; envios para destinos diferentes
+    continuam simultâneos. Sem `ordered`, até `max_in_flight` envios para o mesmo
+    destino podem ocorrer ao mesmo tempo e chegar fora de ordem.
+    """
+
+    def __init__(self, base_url: str, max_in_flight: int = 4, timeout: float = WHATSAPP_TIMEOUT,
+                 max_retries: int = WHATSAPP_MAX_RETRIES, retry_backoff: float = WHATSAPP_RETRY_BACKOFF,
+                 max_retry_delay: float = WHATSAPP_MAX_RETRY_DELAY, ordered: bool = True):
+        self.base_url = base_url
+        self.max_in_flight = max(1, max_in_flight)
+        self.ordered = ordered
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.max_retry_delay = max_retry_delay
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Um lock por destino no modo ordenado; o asyncio.Lock atende na ordem de chegada
+        self._destination_locks: Dict[str, asyncio.Lock] = {}
+        # Horário (time.monotonic) até o qual os envios aguardam, após um Retry-After
+        self._paused_until = 0.0
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        # O event loop e a thread só são criados no primeiro envio
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="wpp-gateway", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        import aiohttp
+
+        # Executado sempre dentro do event loop, então não precisa de lock
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(self.max_retry_delay, retry_after)
+        # Full jitter: espera aleatória entre zero e o backoff exponencial
+        return random.uniform(0, min(self.max_retry_delay, self.retry_backoff * (2 ** attempt)))
+
+    async def _wait_if_paused(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _post(self, destination: str, caption: str, image_bytes: bytes,
+                    image_format: str) -> "aiohttp.ClientResponse":
+        import aiohttp
+
+        form = aiohttp.FormData()
+        form.add_field('phone', destination)
+        form.add_field('caption', caption)
+        form.add_field('view_once', 'false')
+        form.add_field('compress', 'false')
+        form.add_field('image', image_bytes, filename=f"image.{image_format}",
+                       content_type=f"image/{image_format}")
+        async with self._semaphore:
+            async with self._get_session().post(f"{self.base_url}/send/image", data=form) as response:
+                await response.read()
+                return response
+
+    async def send_image(self, destination: str, caption: str, image_bytes: bytes,
+                         image_format: str, url: Optional[str] = None) -> bool:
+        """Envia a imagem com legenda, repetindo em erros temporários. Retorna True se enviou."""
+        if not self.ordered:
+            return await self._send_with_retries(destination, caption, image_bytes, image_format, url)
+        lock = self._destination_locks.setdefault(destination, asyncio.Lock())
+        async with lock:
+            return await self._send_with_retries(destination, caption, image_bytes, image_format, url)
+
+    async def _send_with_retries(self, destination: str, caption: str, image_bytes: bytes,
+                                 image_format: str, url: Optional[str]) -> bool:
+        import aiohttp
+
+        self._get_session()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            await self._wait_if_paused()
+            retry_after = None
+            with span("whatsapp.send", WHATSAPP_SEND_SECONDS, url=url, destination=destination,
+                      bytes=len(image_bytes), attempt=attempt + 1) as current:
+                try:
+                    response = await self._post(destination, caption, image_bytes, image_format)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {str(e)}"
+                    retryable = True
+                else:
+                    if response.status < 400:
+                        current.set(result="ok", status=response.status)
+                        WHATSAPP_SEND_TOTAL.inc(result="ok")
+                        return True
+                    error = f"HTTP {response.status}"
+                    retryable = response.status in RETRYABLE_STATUS
+                    if response.status in THROTTLE_STATUS:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        if retry_after is not None:
+                            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                current.set(result="error", error=error)
+
+            if not retryable or attempt == self.max_retries:
+                break
+            WHATSAPP_SEND_TOTAL.inc(result="retry")
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+        WHATSAPP_SEND_TOTAL.inc(result="error")
+        print(f"Erro ao enviar mensagem para WhatsApp ({destination}): {error}")
+        return False
+
+    def submit(self, destination: str, caption: str, image_bytes: bytes,
+               image_format: str, url: Optional[str] = None) -> Future:
+        """Agenda o envio no event loop e retorna um Future com o resultado (bool)."""
+        return asyncio.run_coroutine_threadsafe(
+            self.send_image(destination, caption, image_bytes, image_format, url), self._get_loop()
+        )
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
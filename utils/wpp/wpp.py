@@ -1,73 +1,136 @@
-import requests
-from typing import Optional
+from concurrent.futures import Future
+from typing import Optional, List, Dict
 import os
 from dotenv import load_dotenv
-import io
 from utils.rss.feed_parser import News
+from utils.wpp.rate_limiter import TokenBucket
+from utils.wpp.gateway_client import AsyncGatewayClient
+
+# Taxa máxima de envio (mensagens por segundo) e rajada permitida
+WHATSAPP_RATE = float(os.getenv("WHATSAPP_RATE", "0.5"))
+WHATSAPP_BURST = float(os.getenv("WHATSAPP_BURST", "1"))
+# Número máximo de envios simultâneos ao gateway
+WHATSAPP_MAX_IN_FLIGHT = int(os.getenv("WHATSAPP_MAX_IN_FLIGHT", "4"))
+# Mantém a ordem das mensagens em cada destino: envios ao mesmo destino um de cada vez
+WHATSAPP_PRESERVE_ORDER = os.getenv("WHATSAPP_PRESERVE_ORDER", "1") == "1"
+
+
+def parse_destinations(value: str) -> List[str]:
+    """
+    Converte uma lista separada por vírgulas em destinos do WhatsApp.
+    IDs sem '@' são tratados como newsletters (ex: "123" -> "123@newsletter").
+    """
+    destinations = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        destinations.append(item if '@' in item else f"{item}@newsletter")
+    return destinations
+
 
 class WhatsAppSender:
-    def __init__(self):
+    def __init__(self, rate: float = WHATSAPP_RATE, burst: float = WHATSAPP_BURST,
+                 destinations: Optional[List[str]] = None, max_in_flight: int = WHATSAPP_MAX_IN_FLIGHT,
+                 preserve_order: bool = WHATSAPP_PRESERVE_ORDER):
         # Carregar variáveis de ambiente
         load_dotenv()
         
-        # Configurar endpoint e ID da newsletter
+        # Configurar endpoint e destinos (newsletters, grupos ou contatos)
         self.whatsapp_host = os.getenv("WHATSAPP_HOST")
-        self.base_url = f"http://{self.whatsapp_host}:3000"
+        self.whatsapp_port = os.getenv("WHATSAPP_PORT", "3000")
+        self.base_url = f"http://{self.whatsapp_host}:{self.whatsapp_port}"
         self.newsletter_id = os.getenv("NEWSLETTER_ID")
-        if not self.newsletter_id:
-            raise ValueError("NEWSLETTER_ID deve estar definida no arquivo .env")
+        if destinations is None:
+            destinations = parse_destinations(os.getenv("WHATSAPP_DESTINATIONS") or self.newsletter_id or "")
+        if not destinations:
+            raise ValueError("NEWSLETTER_ID ou WHATSAPP_DESTINATIONS deve estar definida no arquivo .env")
+        self.destinations = destinations
+        self.max_in_flight = max(1, max_in_flight)
             
-        self.session = requests.Session()
+        self.client = AsyncGatewayClient(self.base_url, max_in_flight=self.max_in_flight, ordered=preserve_order)
+        self.rate_limiter = TokenBucket(rate, burst)
+
+    def build_caption(self, news: News) -> str:
+        """Monta o texto da mensagem da notícia."""
+        caption = f"*{news.title}*\n\n"
+        if news.summary:
+            caption += f"{news.summary}\n\n"
+        caption += f"Fonte: {news.source}\n"
+        caption += f"Leia mais: {news.url}"
+        return caption
+
+    def build_digest_caption(self, news_list: List[News]) -> str:
+        """Monta o texto de um resumo com várias manchetes, sem os resumos das notícias."""
+        caption = f"*Resumo de notícias* ({len(news_list)})\n\n"
+        caption += "\n\n".join(f"• *{news.title}* ({news.source})\n{news.url}" for news in news_list)
+        return caption
         
-    def send_news(self, news: News, image_bytes: bytes) -> bool:
+    def send_news(self, news: News, image_bytes: bytes, image_format: Optional[str] = None,
+                  destination: Optional[str] = None, caption: Optional[str] = None) -> bool:
         """
-        Envia uma notícia com imagem para a newsletter do WhatsApp.
+        Envia uma notícia com imagem para um destino do WhatsApp.
         
         Args:
             news: Objeto News contendo as informações da notícia
             image_bytes: Bytes da imagem a ser enviada
+            image_format: Formato real dos bytes da imagem (padrão: news.image_format)
+            destination: Destino da mensagem (padrão: o primeiro destino configurado)
+            caption: Texto já montado da mensagem (padrão: build_caption(news))
             
         Returns:
-            True se enviou com sucesso, False caso contrário
+            True se enviou com sucesso (após as novas tentativas), False caso contrário
         """
-        try:
-            # Preparar a mensagem
-            caption = f"*{news.title}*\n\n"
-            if news.summary:
-                caption += f"{news.summary}\n\n"
-            caption += f"Fonte: {news.source}\n"
-            caption += f"Leia mais: {news.url}"
-            
-            # Criar arquivo temporário em memória
-            image_io = io.BytesIO(image_bytes)
-            image_io.name = f"news_image.{news.image_format}"
-            
-            # Preparar os dados do formulário
-            files = {
-                'image': ('image.' + news.image_format, image_io, 'image/' + news.image_format)
-            }
-            
-            data = {
-                'phone': f"{self.newsletter_id}@newsletter",
-                'caption': caption,
-                'view_once': 'false',
-                'compress': 'false'
-            }
-            
-            # Enviar a requisição
-            response = self.session.post(
-                f"{self.base_url}/send/image",
-                files=files,
-                data=data,
-                timeout=30
-            )
-            
-            response.raise_for_status()
-            return True
+        destination = destination or self.destinations[0]
+        return self.send_news_to_all(news, image_bytes, image_format, [destination], caption)[destination]
+
+    def submit_news_to_all(self, news: News, image_bytes: bytes, image_format: Optional[str] = None,
+                           destinations: Optional[List[str]] = None,
+                           caption: Optional[str] = None) -> Dict[str, Future]:
+        """
+        Agenda o envio da mesma notícia para vários destinos pelo cliente
+        assíncrono, que limita as requisições simultâneas e repete os erros
+        temporários, sem esperar o resultado (só o limite de taxa pode bloquear).
+        A legenda e os bytes da imagem são preparados uma única vez e
+        reaproveitados em todos os envios.
+        
+        Returns:
+            Dicionário {destino: Future com o resultado do envio (bool)}
+        """
+        destinations = self.destinations if destinations is None else destinations
+        image_format = image_format or news.image_format or 'jpeg'
+        if caption is None:
+            caption = self.build_caption(news)
             
-        except requests.RequestException as e:
-            print(f"Erro ao enviar mensagem para WhatsApp: {str(e)}")
-            return False
+        futures = {}
+        for destination in destinations:
+            # Aguardar a vez dentro do limite de taxa
+            self.rate_limiter.acquire()
+            futures[destination] = self.client.submit(destination, caption, image_bytes, image_format, news.url)
+        return futures
+
+    def send_news_to_all(self, news: News, image_bytes: bytes, image_format: Optional[str] = None,
+                         destinations: Optional[List[str]] = None, caption: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Envia a mesma notícia para vários destinos em paralelo e espera o resultado.
+        
+        Returns:
+            Dicionário {destino: enviado com sucesso}
+        """
+        futures = self.submit_news_to_all(news, image_bytes, image_format, destinations, caption)
+        return {destination: future.result() for destination, future in futures.items()}
+
+    def send_digest_to_all(self, news_list: List[News], image_bytes: bytes, image_format: Optional[str] = None,
+                           destinations: Optional[List[str]] = None) -> Dict[str, bool]:
+        """
+        Envia várias notícias em uma única mensagem com uma imagem, para todos os destinos.
+        A notícia mais recente da lista identifica o envio nas métricas.
+        """
+        return self.send_news_to_all(news_list[-1], image_bytes, image_format, destinations,
+                                     caption=self.build_digest_caption(news_list))
+
+    def close(self):
+        self.client.close()
 
 
 if __name__ == "__main__":
@@ -87,12 +150,13 @@ if __name__ == "__main__":
     
     # Baixar a imagem
     scraper = ImageScraper()
-    image_bytes, _ = scraper.get_image_bytes(news)
+    image = scraper.get_image_bytes(news)
     
-    if image_bytes:
+    if image:
         # Enviar a mensagem
+        image_bytes, image_format = image
         sender = WhatsAppSender()
-        success = sender.send_news(news, image_bytes)
+        success = sender.send_news(news, image_bytes, image_format)
         print(f"Mensagem enviada com sucesso: {success}")
     else:
         print("Erro ao baixar a imagem")